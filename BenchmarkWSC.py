@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+# Stage benchmark of easy_WSC.py on a synthetic dataset
+#   generates a dataset with GenerateWSC.py, runs easy_WSC.py with -timings YES and
+#   collects the time of each stage (merge, scale, load, shuffle & limit, fold writing,
+#   grid search, train, predict, result merge) into a JSON report:
+#   { "config": {...}, "runs": [ { "wall": s, "peak_rss": bytes, "children_peak_rss": bytes, "stages": {...} }, ... ], "stages": { name: median total } }
+# The timed runs start without wsc_cache/ and run with -cache NO, so every run does the full work.
+# -cachedRun YES also reports a run that finds wsc_cache/ filled by the run before it ("cached").
+# "-svm local" uses the stand-ins of wsc_standin.py instead of libSVM.
+
+import sys, os, json, time, glob, shutil
+from subprocess import *
+from GenerateWSC import generate
+import wsc_standin
+from wsc_cache import defaultPath
+
+def exit_with_help(error=''):
+    print("""\
+Usage: BenchmarkWSC.py [options] [-- easy_WSC.py options]
+
+options:
+   -out { /Path/ } : Working Directory (dataset, outputs and report)
+   -report { /Path/File } : Report File (default /Path/benchmark.json)
+   -sites { #Number } : Number of Websites (default 10)
+   -subpages { #Number } : Number of Subpages per Website (default 20)
+   -instances { #Number } : Instances per Subpage (default 10)
+   -mainInstances { #Number } : Instances per Main Page (default 10)
+   -background { #Number } : Background Instances (default 1000, 0 for closed world)
+   -features { #Number } : Number of Features (default 104)
+   -seed { #Number } : Random Seed of the Dataset (default 0)
+   -runs { #Number } : Repetitions of the Evaluation (default 3)
+   -svm { /Path/ | local } : Path to libSVM binaries or local Stand-ins (default local)
+   -cachedRun { YES | NO } : Also report a Run with a filled wsc_cache/ (default NO)
+
+Options after "--" are passed to easy_WSC.py (e.g. -- -backend inprocess -quickCV NO).
+ """)
+    print(error)
+    sys.exit(1)
+
+def median(values):
+	values = sorted(values)
+	if not values:
+		return None
+	middle = len(values) // 2
+	if len(values) % 2:
+		return values[middle]
+	return (values[middle-1] + values[middle]) / 2.0
+
+def runEvaluation(inputpath, outputpath, svmpath, setting, extra, cache='NO'):
+	# wall time and stage timings of one easy_WSC.py run
+	if os.path.isdir(outputpath):
+		shutil.rmtree(outputpath)
+	os.makedirs(outputpath)
+	if cache == 'NO' and os.path.isdir(defaultPath(inputpath)):
+		shutil.rmtree(defaultPath(inputpath))
+	easy = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'easy_WSC.py')
+	cmd = [ sys.executable, easy, '-in', inputpath, '-out', outputpath + '/', '-svm', svmpath, '-timings', 'YES', '-storage', 'High', '-q' ]
+	if setting == 'OW':
+		cmd += [ '-setting', 'OW', '-background', 'Background' ]
+	start = time.time()
+	# -cache after the passed options, they cannot turn it on for timed runs
+	process = Popen(cmd + extra + [ '-cache', cache ], stdout = PIPE, stderr = PIPE)
+	out, err = process.communicate()
+	wall = time.time() - start
+	timings = glob.glob(os.path.join(outputpath, '*.timings'))
+	if process.returncode != 0 or not timings:
+		print('Error: Evaluation failed!')
+		print(out.decode() + err.decode())
+		raise SystemExit
+	run = { 'wall': wall, 'stages': {}, 'peak_rss': 0, 'children_peak_rss': 0 }
+	for timings_file in timings:
+		ftimings = open(timings_file, 'r')
+		site = json.load(ftimings)
+		run['peak_rss'] = max(run['peak_rss'], site['peak_rss'])
+		run['children_peak_rss'] = max(run['children_peak_rss'], site.get('children_peak_rss', 0))
+		for name, stage in site['stages'].items():
+			total = run['stages'].setdefault(name, { 'count': 0, 'total': 0.0, 'max': 0.0 })
+			total['count'] += stage['count']
+			total['total'] += stage['total']
+			total['max'] = max(total['max'], stage['max'])
+		ftimings.close()
+	return run
+
+if __name__ == '__main__':
+	workpath = None
+	report_file = None
+	svmpath = 'local'
+	cachedRun = False
+	values = { 'sites': 10, 'subpages': 20, 'instances': 10, 'mainInstances': 10, 'background': 1000, 'features': 104, 'seed': 0, 'runs': 3 }
+	options = sys.argv[1:]
+	extra = []
+	if '--' in options:
+		extra = options[options.index('--')+1:]
+		options = options[:options.index('--')]
+	i = 0
+	while i < len(options):
+		if i + 1 >= len(options):
+			exit_with_help('Error: Missing Value! (' + options[i] + ')')
+		if options[i] == '-out':
+			workpath = options[i+1]
+		elif options[i] == '-report':
+			report_file = options[i+1]
+		elif options[i] == '-svm':
+			svmpath = options[i+1]
+		elif options[i] == '-cachedRun':
+			if options[i+1] not in [ 'YES', 'NO' ]:
+				exit_with_help('Error: Unknown Value! (' + options[i] + ' ' + options[i+1] + ')')
+			cachedRun = options[i+1] == 'YES'
+		elif options[i][1:] in values:
+			if not options[i+1].isdigit():
+				exit_with_help('Error: ' + options[i] + ' is not a Number!')
+			values[options[i][1:]] = int(options[i+1])
+		else:
+			exit_with_help('Error: Unknown Argument! (' + options[i] + ')')
+		i = i + 2
+	if workpath == None:
+		exit_with_help('Error: No Working Directory!')
+	if report_file == None:
+		report_file = os.path.join(workpath, 'benchmark.json')
+	runs = values.pop('runs')
+
+	# Dataset
+	start = time.time()
+	inputpath = generate(os.path.join(workpath, 'data'), **values) + '/'
+	generated = time.time() - start
+	if svmpath == 'local':
+		svmpath = wsc_standin.install(os.path.join(workpath, 'standin'))
+	setting = 'OW' if values['background'] > 0 else 'CW'
+
+	# Evaluations, each without cache
+	report = { 'config': dict(values, runs=runs, svm=svmpath, setting=setting, options=extra), 'generate': generated, 'runs': [] }
+	for run in range(runs):
+		report['runs'].append(runEvaluation(inputpath, os.path.join(workpath, 'output'), svmpath, setting, extra))
+		print('Run {0}: {1:.3f}s'.format(run+1, report['runs'][-1]['wall']))
+	names = sorted(set([ name for run in report['runs'] for name in run['stages'] ]))
+	report['stages'] = dict((name, median([ run['stages'][name]['total'] for run in report['runs'] if name in run['stages'] ])) for name in names)
+	report['wall'] = median([ run['wall'] for run in report['runs'] ])
+	if cachedRun:
+		# The first run fills wsc_cache/, the second one is reported
+		runEvaluation(inputpath, os.path.join(workpath, 'output'), svmpath, setting, extra, 'YES')
+		report['cached'] = runEvaluation(inputpath, os.path.join(workpath, 'output'), svmpath, setting, extra, 'YES')
+		print('Cached Run: {0:.3f}s'.format(report['cached']['wall']))
+
+	freport = open(report_file, 'w')
+	json.dump(report, freport, indent=1, sort_keys=True)
+	freport.write('\n')
+	freport.close()
+	for name in names:
+		print('{0:<16} {1:10.3f}s'.format(name, report['stages'][name]))
+	print('Report: ' + report_file)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+# Generates a synthetic WSC dataset in the layout easy_WSC.py reads
+#   wsc{Site}_{Format}: subpages of a website, one label per page (1..n)
+#   mainPages_{Format}: main pages, labeled with the number of their website
+#   {Background}_{Format} & list_{background}_{Format}.txt: background instances (label 0) and their links
+# Instances are noisy copies of a random profile per page with CUMULATIVE-like features.
+# Some background links belong to a website's domain, so the domain filter has work to do.
+
+import sys, os
+try:
+	import numpy as np
+except ImportError:
+	print('You need numpy! (pip install numpy)')
+	sys.exit()
+
+def exit_with_help(error=''):
+    print("""\
+Usage: GenerateWSC.py [options]
+
+options:
+   -out { /Path/ } : Output Path (files are written to /Path/wsc_features/)
+   -sites { #Number } : Number of Websites (default 10)
+   -subpages { #Number } : Number of Subpages per Website (default 20)
+   -instances { #Number } : Instances per Subpage (default 10)
+   -mainInstances { #Number } : Instances per Main Page (default 10)
+   -background { #Number } : Background Instances (default 1000, 0 for none)
+   -features { #Number } : Number of Features (default 104)
+   -noise { #Number } : Spread of Instances around their Page (default 0.3)
+   -seed { #Number } : Random Seed (default 0)
+ """)
+    print(error)
+    sys.exit(1)
+
+# Rows that are formatted at once
+chunkSize = 4096
+
+def writeInstances(fout, labels, features):
+	line = '%d ' + ''.join([ '%d:%%.6g ' % (column+1) for column in range(features.shape[1]) ]) + '\n'
+	for start in range(0, len(labels), chunkSize):
+		rows = np.column_stack((labels[start:start+chunkSize], features[start:start+chunkSize])).tolist()
+		fout.write(''.join([ line % tuple(row) for row in rows ]))
+
+def pageInstances(rng, pages, instances, features, noise):
+	# CUMULATIVE-like instances: 4 counts followed by a growing sequence, spread around a page profile
+	profiles = rng.gamma(2.0, 1.0, size=(pages, features))
+	profiles[:, 4:] = np.cumsum(profiles[:, 4:], axis=1)
+	profiles *= rng.uniform(50, 500, size=(pages, 1))
+	values = np.repeat(profiles, instances, axis=0)
+	values *= 1 + noise * rng.standard_normal(values.shape)
+	return np.round(values, 3)
+
+def generate(outputpath, sites=10, subpages=20, instances=10, mainInstances=10, background=1000, features=104, noise=0.3, seed=0, form='TCP', bg_name='Background'):
+	rng = np.random.RandomState(seed)
+	path = os.path.join(outputpath, 'wsc_features')
+	if not os.path.isdir(path):
+		os.makedirs(path)
+	names = [ 'Site' + str(site) for site in range(1, sites+1) ]
+
+	fmain = open(os.path.join(path, 'mainPages_' + form), 'w')
+	for site, name in enumerate(names, 1):
+		fout = open(os.path.join(path, 'wsc' + name + '_' + form), 'w')
+		labels = np.repeat(np.arange(1, subpages+1), instances)
+		writeInstances(fout, labels, pageInstances(rng, subpages, instances, features, noise))
+		fout.close()
+		writeInstances(fmain, np.full(mainInstances, site), pageInstances(rng, 1, mainInstances, features, noise))
+	fmain.close()
+
+	if background > 0:
+		fout = open(os.path.join(path, bg_name + '_' + form), 'w')
+		writeInstances(fout, np.zeros(background, np.int64), pageInstances(rng, background, 1, features, noise))
+		fout.close()
+		# every 50th link belongs to a website and has to be filtered out
+		flinks = open(os.path.join(path, 'list_' + bg_name[0].lower() + bg_name[1:] + '_' + form + '.txt'), 'w')
+		for i in range(background):
+			if i % 50 == 0 and sites > 0:
+				flinks.write('https://www.' + names[rng.randint(sites)].lower() + '.com/page' + str(i) + '\n')
+			else:
+				flinks.write('https://www.background' + str(i) + '.org/\n')
+		flinks.close()
+	return path
+
+if __name__ == '__main__':
+	outputpath = None
+	values = { 'sites': 10, 'subpages': 20, 'instances': 10, 'mainInstances': 10, 'background': 1000, 'features': 104, 'seed': 0 }
+	noise = 0.3
+	options = sys.argv[1:]
+	i = 0
+	while i < len(options):
+		if i + 1 >= len(options):
+			exit_with_help('Error: Missing Value! (' + options[i] + ')')
+		if options[i] == '-out':
+			outputpath = options[i+1]
+		elif options[i] == '-noise':
+			noise = float(options[i+1])
+		elif options[i][1:] in values:
+			if not options[i+1].isdigit():
+				exit_with_help('Error: ' + options[i] + ' is not a Number!')
+			values[options[i][1:]] = int(options[i+1])
+		else:
+			exit_with_help('Error: Unknown Argument! (' + options[i] + ')')
+		i = i + 2
+	if outputpath == None:
+		exit_with_help('Error: No Output Path!')
+	print(generate(outputpath, noise=noise, **values))
@@ -2,60 +2,219 @@
 
 # Merges Subpages for eval and adjusts class naming accordingly
 # Prepares file for regular easy.py evaluation
+#   {Name}_{Format}: all instances of wsc*_{Format}, labeled with the number of their website,
+#                    followed by the main pages (mainPages_{Format}) if they are used
+#   list_{name}_{Format}.txt: the website files in the order of their labels
+#   wsc_cache/parsed/: the same instances parsed (-binary YES), stored like FeatureCache.loadParsed
+#                    stores {Name}_{Format}, so the merged file is loaded without parsing
+# Site files are read, relabeled and parsed in parallel. Every process writes its part next to
+# the output, the parts are copied into the output in large blocks.
 
-import sys
-import os
-
-import random, glob
+import sys, os, shutil, tempfile
+import glob
+from multiprocessing import Pool
 try:
-    from natsort import natsorted
+	from natsort import natsorted
 except:
 	print('You need natsort! (pip install natsort)')
 	sys.exit()
+try:
+	import numpy as np
+except ImportError:
+	print('You need numpy! (pip install numpy)')
+	sys.exit()
+from wsc_scale import parseInstances
+from wsc_cache import FeatureCache, defaultPath
+
+def exit_with_help(error=''):
+    print("""\
+Usage: PrepareWSC.py [options]
+
+options:
+   -in { /Path/ } : Input Path of the wsc*_{Format} Files (default $dir_TEMP/wsc_features/)
+   -out { /Path/ } : Output Path (default Input Path)
+   -name { Name } : Name of the merged Output (default allSubPages)
+   -format { TCP | ... } : Input Format (default TCP)
+   -main { YES | NO } : Append the Main Pages (default YES)
+   -shuffle { YES | NO } : Randomize the Order of the Instances (default NO)
+   -seed { #Number } : Random Seed of -shuffle (default 0)
+   -binary { YES | NO } : Also store the parsed Dataset in wsc_cache/ next to the Output Path (default NO)
+   -worker { #Number } : Number of Processes reading the Site Files (default #Threads)
+   -q : Quiet Mode (no Outputs)
+ """)
+    print(error)
+    sys.exit(1)
 
-###### CONFIG ###### 
-# How the "temporary" output and result is named 
-scenario = 'allSubPages'
-# Should the main page be used? (Training in each fold)
-main = True
-if main:
-	scenario = scenario + '_main'
-# Input directory
-inputpath = os.getenv('dir_TEMP')+'wsc_features/'
-# Input format
-form = 'TCP'
-# Should the input be randomized?
-shuffle = False
-####################
-
-merged_file = inputpath + '/' + scenario + '_' + form
-info_file = inputpath + '/' + 'list_' + scenario[0].lower() + scenario[1:] + '_' + form + '.txt'
-
-# Merge input files
-fout = open(merged_file, 'w')
-finfo = open(info_file, 'w')
-site = 1
-for filename in natsorted(glob.glob(inputpath+'wsc*_'+form)):
-        print filename
-	fin = open(filename,'r')
-	_, info = os.path.split(filename)
-	#last = 0
-	for line in fin:
-		fout.write(str(site) + ' ' + line.split(' ', 1)[-1])
-		#if int(line.split()[0]) != last:
-			#fout.write(str(site) + ' ' + line.split(' ', 1)[-1])
-			#last = int(line.split()[0])
+# Size of the output buffer
+bufferSize = 1 << 24
+
+def relabel(text, label):
+	# Replaces the label of every line, like str(label) + ' ' + line.split(' ', 1)[-1]
+	prefix = str(label) + ' '
+	lines = text.split('\n')
+	# text after the last newline, empty for complete files
+	end = lines.pop()
+	relabeled = [ prefix + line[line.find(' ')+1:] for line in lines ]
+	if end:
+		return '\n'.join(relabeled + [ prefix + end[end.find(' ')+1:] ])
+	return ''.join([ line + '\n' for line in relabeled ])
+
+def readSite(job):
+	# Writes the relabeled text (and parsed instances) of a site file to part, returns the part
+	filename, label, part, binary = job
+	fin = open(filename, 'r')
+	content = fin.read()
 	fin.close()
-	finfo.write(info+'\n')
-	site += 1
-fout.close()
-finfo.close()
-
-if main:
-	fin = open(inputpath + '/mainPages_' + form, 'r')
-	fout = open(merged_file, 'a')
-	for line in fin:
-		fout.write(line)
+	if label is not None:
+		content = relabel(content, label)
+	fout = open(part, 'w')
+	fout.write(content)
 	fout.close()
-	fin.close()
+	if binary:
+		labels, features = parseInstances(content)
+		np.save(part + '.labels.npy', labels)
+		np.save(part + '.features.npy', features)
+	return part
+
+def stackInstances(blocks):
+	# (labels, features) of all blocks, shorter rows are padded with 0 like svm-scale's missing features
+	count = sum([ len(labels) for labels, _ in blocks ])
+	width = max([ features.shape[1] for _, features in blocks ] + [ 0 ])
+	labels = np.empty(count)
+	features = np.zeros((count, width))
+	start = 0
+	for blockLabels, blockFeatures in blocks:
+		labels[start:start+len(blockLabels)] = blockLabels
+		features[start:start+len(blockLabels), :blockFeatures.shape[1]] = blockFeatures
+		start += len(blockLabels)
+	return labels, features
+
+if __name__ == '__main__':
+	scenario = 'allSubPages'
+	inputpath = os.getenv('dir_TEMP') + 'wsc_features/' if os.getenv('dir_TEMP') != None else None
+	outputpath = None
+	form = 'TCP'
+	main = True
+	shuffle = False
+	seed = 0
+	binary = False
+	nr_worker = None
+	quiet = False
+
+	options = sys.argv[1:]
+	i = 0
+	while i < len(options):
+		if options[i] == '-q':
+			quiet = True
+			i = i + 1
+			continue
+		if i + 1 >= len(options):
+			exit_with_help('Error: Missing Value! (' + options[i] + ')')
+		if options[i] == '-in':
+			inputpath = options[i+1]
+		elif options[i] == '-out':
+			outputpath = options[i+1]
+		elif options[i] == '-name':
+			scenario = options[i+1]
+		elif options[i] == '-format':
+			form = options[i+1]
+		elif options[i] in [ '-main', '-shuffle', '-binary' ]:
+			if options[i+1] not in [ 'YES', 'NO' ]:
+				exit_with_help('Error: Unknown Value! (' + options[i] + ' ' + options[i+1] + ')')
+			value = options[i+1] == 'YES'
+			if options[i] == '-main':
+				main = value
+			elif options[i] == '-shuffle':
+				shuffle = value
+			else:
+				binary = value
+		elif options[i] == '-seed' or options[i] == '-worker':
+			if not options[i+1].isdigit():
+				exit_with_help('Error: ' + options[i] + ' is not a Number!')
+			if options[i] == '-seed':
+				seed = int(options[i+1])
+			else:
+				nr_worker = max(1, int(options[i+1]))
+		else:
+			exit_with_help('Error: Unknown Argument! (' + options[i] + ')')
+		i = i + 2
+
+	if inputpath == None:
+		exit_with_help('Error: No Input Path!')
+	if not os.path.isdir(inputpath):
+		exit_with_help('Error: Input Path does not exist!')
+	if outputpath == None:
+		outputpath = inputpath
+	elif not os.path.isdir(outputpath):
+		os.makedirs(outputpath)
+	if nr_worker == None:
+		import multiprocessing
+		nr_worker = multiprocessing.cpu_count()
+	if main:
+		scenario = scenario + '_main'
+
+	merged_file = os.path.join(outputpath, scenario + '_' + form)
+	info_file = os.path.join(outputpath, 'list_' + scenario[0].lower() + scenario[1:] + '_' + form + '.txt')
+
+	sites = natsorted(glob.glob(os.path.join(inputpath, 'wsc*_' + form)))
+	if not sites:
+		print('Error: No Website Files! (' + os.path.join(inputpath, 'wsc*_' + form) + ')')
+		raise SystemExit
+	jobs = [ (filename, site) for site, filename in enumerate(sites, 1) ]
+	if main:
+		main_file = os.path.join(inputpath, 'mainPages_' + form)
+		if not os.path.isfile(main_file):
+			print('Error: No Main Pages! (' + main_file + ')')
+			raise SystemExit
+		# Main pages keep their labels
+		jobs.append((main_file, None))
+	parts_path = tempfile.mkdtemp(prefix='.' + scenario + '_' + form + '.', dir=outputpath)
+	jobs = [ (filename, site, os.path.join(parts_path, str(k)), binary) for k, (filename, site) in enumerate(jobs) ]
+
+	# Merge input files, in the order of the sites
+	fout = open(merged_file, 'w', bufferSize) if not shuffle else None
+	finfo = open(info_file, 'w')
+	lines = []; blocks = []
+	# A single worker reads in this process
+	pool = Pool(min(nr_worker, len(jobs))) if nr_worker > 1 else None
+	try:
+		for (filename, site, _, _), part in zip(jobs, pool.imap(readSite, jobs) if pool is not None else map(readSite, jobs)):
+			if site is not None:
+				if not quiet:
+					print(filename)
+				finfo.write(os.path.basename(filename) + '\n')
+			fin = open(part, 'r')
+			if fout is not None:
+				shutil.copyfileobj(fin, fout, bufferSize)
+			else:
+				lines.extend(fin.readlines())
+			fin.close()
+			if binary:
+				blocks.append((np.load(part + '.labels.npy'), np.load(part + '.features.npy')))
+			os.remove(part)
+	finally:
+		if pool is not None:
+			pool.close()
+			pool.join()
+		shutil.rmtree(parts_path)
+	finfo.close()
+
+	if shuffle:
+		# text and binary output get the same permutation of the instances
+		fout = open(merged_file, 'w', bufferSize)
+		fout.write(''.join([ lines[k] for k in np.random.RandomState(seed).permutation(len(lines)) ]))
+		lines = None
+	fout.close()
+
+	if binary:
+		labels, features = stackInstances(blocks)
+		blocks = None
+		if shuffle:
+			order = np.random.RandomState(seed).permutation(len(labels))
+			labels = labels[order]; features = features[order]
+		# keyed by the content of the merged file, like a file parsed by easy_WSC.py -cache YES
+		FeatureCache(defaultPath(outputpath)).storeParsed(merged_file, labels, features)
 
+	if not quiet:
+		print('Output: ' + merged_file + (' (parsed in ' + defaultPath(outputpath) + ')' if binary else ''))
+		print('Sites: ' + info_file)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+
+# Runs the steps of ProcessWSC.sh for several websites at once
+#   1. link the fetches of the site into its own scratch directory and merge them (merge-input.sh)
+#   2. move the main page (shortest file name) to the main pages
+#   3. outlier removal, with -ignoreOutlier YES if too few subpages remain
+#   4. keep a (seeded) random selection of the fixed number of subpages
+#      script: outlier-removal.py, repeated with -ignoreOutlier YES if needed
+#      native: wsc_traces.py reads the traces once and computes both outlier selections,
+#              only the sampled subpages are written
+#      check:  script, every selection of outlier-removal.py is compared with the native rule
+#   5. feature generation into wsc_features/
+#      script: generate-feature.py
+#      native: wsc_cumulative.py computes the CUMULATIVE features of many traces at once in a
+#              process pool and stores the parsed dataset in wsc_cache/ for easy_WSC.py
+#      check:  script, every feature file is compared with the native features
+#   6. remove the scratch directory of the site
+# followed by the outlier removal and feature generation of the main pages.
+#
+# Every site has its own scratch directory (wsc_scratch/{site}/), so sites run concurrently.
+# A failing site does not stop the others, its error is written to its log (wsc_scratch/logs/).
+# Finished sites are marked in wsc_scratch/done/ and skipped when an interrupted run is started
+# again, the scratch tree is removed once all sites and the main pages are processed.
+
+import sys, os, random, shutil, threading, traceback
+from datetime import datetime
+from subprocess import *
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import wsc_traces, wsc_cumulative
+
+def exit_with_help(error=''):
+    print("""\
+Usage: ProcessWSC.py [options]
+
+options:
+   -in { /Path/ } : Compiled Fetches (default $dir_TEMP_COMPILED)
+   -scripts { /Path/ } : Fetch Scripts (merge-input.sh, generate-feature.py, outlier-removal.py) (default $dir_FETCH_SCRIPTS)
+   -instances { #Number } : Instances per Subpage (default 10)
+   -instancesMain { #Number } : Instances per Main Page (default 10)
+   -subpages { #Number } : Subpages per Website (default 20)
+   -worker { #Number } : Number of Websites processed at once (default #Threads)
+   -seed { #Number } : Random Seed of the Instance & Subpage Selection (default 0)
+   -outlierRemoval { script | native | check } : Outlier Removal & Subpage Selection with outlier-removal.py, in one Pass
+                                                 or with outlier-removal.py compared to the native Pass (default script)
+   -featureGeneration { script | native | check } : generate-feature.py, batched CUMULATIVE Features or
+                                                    generate-feature.py compared to the native Features (default script)
+   -q : Quiet Mode (no Outputs)
+ """)
+    print(error)
+    sys.exit(1)
+
+# Format of the merged fetches, the only one ProcessWSC.sh handles
+form = 'output-tcp'
+
+def log(message):
+	if not quiet:
+		# one write per line, sites log concurrently
+		sys.stdout.write('[' + str(datetime.now()).split('.')[0] + '] ' + message + '\n')
+		sys.stdout.flush()
+
+def siteNames(inputpath):
+	# Fetches are named *_*_*_*_{site}_..., like "ls | cut -d _ -f 5 | sort -u"
+	sites = {}
+	for fetch in sorted(os.listdir(inputpath)):
+		fields = fetch.split('_')
+		if len(fields) >= 5:
+			sites.setdefault(fields[4], []).append(fetch)
+	return sites
+
+def mainPage(pages):
+	# Shortest file name, the first one of equally long names
+	return min(pages, key=lambda page: (len(page), page))
+
+def run(cmd, log_file):
+	# Runs a fetch script, its output goes to the log of the site
+	flog = open(log_file, 'a')
+	flog.write('$ ' + ' '.join(cmd) + '\n')
+	flog.flush()
+	status = Popen(cmd, stdout = flog, stderr = STDOUT).wait()
+	flog.close()
+	if status != 0:
+		raise RuntimeError('{0} failed with exit status {1} (see {2})'.format(os.path.basename(cmd[0]), status, log_file))
+
+def outlierRemoval(inputpath, outputpath, ignoreOutlier, instances, log_file):
+	run([ os.path.join(scriptpath, 'outlier-removal.py'), '-in', inputpath, '-out', outputpath, '-setting', 'CW',
+	      '-ignoreOutlier', ignoreOutlier, '-outlierRemoval', 'Simple', '-randomInstances', 'YES',
+	      '-referenceFormat', 'tcp', '-instances', str(instances) ], log_file)
+
+def generateFeatures(inputpath, instances, dataSet, log_file):
+	if featureMode == 'native':
+		# CPU bound, runs in the process pool, "-randomInstances NO": the first instances of each page
+		featurePool.apply(wsc_cumulative.generate, (os.path.join(inputpath, form + '-outlierfree'), features_path, dataSet, 'TCP', instances))
+		return
+	run([ os.path.join(scriptpath, 'generate-feature.py'), '-in', inputpath, '-out', features_path, '-setting', 'CW',
+	      '-classifier', 'CUMULATIVE', '-features', '100', '-randomInstances', 'NO', '-instances', str(instances),
+	      '-dataSet', dataSet ], log_file)
+	if featureMode == 'check':
+		# -featureGeneration check: the native features have to match generate-feature.py's file
+		mismatches = featurePool.apply(wsc_cumulative.compareFile, (os.path.join(inputpath, form + '-outlierfree'),
+		                               os.path.join(features_path, dataSet + '_TCP'), instances))
+		flog = open(log_file, 'a')
+		flog.write('feature generation check: {0} differences\n'.format(len(mismatches)))
+		flog.write(''.join([ '  ' + mismatch + '\n' for mismatch in mismatches ]))
+		flog.close()
+		if mismatches:
+			featureMismatches.append(dataSet)
+			log('{0}: Feature Generation - native differs (see {1})'.format(dataSet, log_file))
+
+def nativeOutlierRemoval(pagespath, outputpath, instances, subpages, rng, log_file):
+	# Steps 3 & 4 in one pass, subpages None keeps every page
+	if os.path.isdir(pagespath):
+		strict, fallback, lines = wsc_traces.selectPages(pagespath, instances, rng)
+	else:
+		strict, fallback, lines = {}, {}, {}
+	flog = open(log_file, 'a')
+	flog.write('outlier removal: {0} pages without outliers, {1} with outliers\n'.format(len(strict), len(fallback)))
+	flog.close()
+	selection = strict
+	if subpages is not None and len(strict) < subpages:
+		# We don't have enough! Ignore Outlier
+		selection = fallback
+		if len(selection) < subpages:
+			raise RuntimeError('Not enough Subpages ({0}/{1})'.format(len(selection), subpages))
+	outliersKept = selection is not strict
+	if subpages is not None and len(selection) > subpages:
+		selection = dict((page, selection[page]) for page in rng.sample(sorted(selection), subpages))
+	wsc_traces.writePages(os.path.join(outputpath, form + '-outlierfree'), selection, lines)
+	return outliersKept
+
+def checkOutlierRemoval(name, pagespath, outlierfree, ignoreOutlier, instances, log_file):
+	# -outlierRemoval check: the native rule has to select what outlier-removal.py selected
+	mismatches = wsc_traces.compareSelection(pagespath, outlierfree, instances, ignoreOutlier == 'YES')
+	flog = open(log_file, 'a')
+	flog.write('outlier removal check (-ignoreOutlier {0}): {1} differences\n'.format(ignoreOutlier, len(mismatches)))
+	flog.write(''.join([ '  ' + mismatch + '\n' for mismatch in mismatches ]))
+	flog.close()
+	if mismatches:
+		outlierMismatches.append(name)
+		log('{0}: Outlier Removal - native differs in {1} places (see {2})'.format(name, len(mismatches), log_file))
+
+def processSite(site, fetches):
+	scratch = os.path.join(scratch_path, site)
+	compiled = os.path.join(scratch, 'wsc_compiled')
+	merged = os.path.join(scratch, 'wsc_merged')
+	outlier = os.path.join(scratch, 'wsc_outlier')
+	log_file = os.path.join(scratch_path, 'logs', site + '.log')
+	# Leftovers of an interrupted run are started over
+	if os.path.isdir(scratch):
+		shutil.rmtree(scratch)
+	if os.path.isfile(log_file):
+		os.remove(log_file)
+	os.makedirs(compiled)
+
+	# Step 1: Merge Instances of Pages (CW - Setting), the fetches are linked instead of copied
+	log(site + ': Merging')
+	for fetch in fetches:
+		os.symlink(os.path.abspath(os.path.join(inputpath, fetch)), os.path.join(compiled, fetch))
+	run([ os.path.join(scriptpath, 'merge-input.sh'), '-in', compiled + '/', '-out', merged + '/', '-setting', 'CW' ], log_file)
+
+	# Step 2: Backup Mainpage (Shortest Filename)
+	mainpage = None
+	pages_path = os.path.join(merged, form)
+	if os.path.isdir(pages_path) and os.listdir(pages_path):
+		mainpage = mainPage(os.listdir(pages_path))
+		log(site + ': Main Page ' + mainpage)
+		with mainLock:
+			if not os.path.isdir(os.path.join(main_path, form)):
+				os.makedirs(os.path.join(main_path, form))
+		shutil.move(os.path.join(pages_path, mainpage), os.path.join(main_path, form, mainpage))
+
+	# Step 3: Perform Outlier Removal (Fixed Number of Instances per Page)
+	# Step 4: Keep only Fixed Number of Subpages
+	log(site + ': Outlier Removal')
+	outlierfree = os.path.join(outlier, form + '-outlierfree')
+	# One draw per site, independent of the order in which sites are processed
+	rng = random.Random('{0}:{1}'.format(seed, site))
+	if outlierMode == 'native':
+		if nativeOutlierRemoval(pages_path, outlier, instances, subpages, rng, log_file):
+			log(site + ': Outlier Removal - Outliers kept')
+	else:
+		outlierRemoval(merged + '/', outlier + '/', 'NO', instances, log_file)
+		if outlierMode == 'check':
+			checkOutlierRemoval(site, pages_path, outlierfree, 'NO', instances, log_file)
+		pages = os.listdir(outlierfree) if os.path.isdir(outlierfree) else []
+		if len(pages) < subpages:
+			# We don't have enough! Ignore Outlier
+			log(site + ': Outlier Removal - Repeated')
+			outlierRemoval(merged + '/', outlier + '/', 'YES', instances, log_file)
+			if mainpage is not None and os.path.isfile(os.path.join(outlierfree, mainpage)):
+				os.remove(os.path.join(outlierfree, mainpage))
+			if outlierMode == 'check':
+				checkOutlierRemoval(site, pages_path, outlierfree, 'YES', instances, log_file)
+			pages = os.listdir(outlierfree) if os.path.isdir(outlierfree) else []
+			if len(pages) < subpages:
+				raise RuntimeError('Not enough Subpages ({0}/{1})'.format(len(pages), subpages))
+		if len(pages) > subpages:
+			log(site + ': Too many Subpages ({0}/{1}) - removing'.format(len(pages), subpages))
+			for page in rng.sample(sorted(pages), len(pages) - subpages):
+				os.remove(os.path.join(outlierfree, page))
+
+	# Step 5: Generate Features (CW - Setting) and merge into Single File for Site
+	log(site + ': Feature Generation')
+	generateFeatures(outlier + '/', instances, site, log_file)
+
+	# Step 6: Clean up
+	shutil.rmtree(scratch)
+	open(os.path.join(scratch_path, 'done', site), 'w').close()
+	log(site + ': Done')
+
+def processSiteSafe(job):
+	# Errors of a site are written to its log, the other sites are processed
+	site, fetches = job
+	try:
+		processSite(site, fetches)
+	except Exception as e:
+		flog = open(os.path.join(scratch_path, 'logs', site + '.log'), 'a')
+		flog.write(traceback.format_exc())
+		flog.close()
+		log(site + ': Failed')
+		return '{0}: {1}'.format(site, e)
+	return None
+
+if __name__ == '__main__':
+	inputpath = os.getenv('dir_TEMP_COMPILED')
+	scriptpath = os.getenv('dir_FETCH_SCRIPTS')
+	instances = 10
+	instancesMain = 10
+	subpages = 20
+	seed = 0
+	nr_worker = None
+	outlierMode = 'script'
+	featureMode = 'script'
+	quiet = False
+
+	options = sys.argv[1:]
+	i = 0
+	while i < len(options):
+		if options[i] == '-q':
+			quiet = True
+			i = i + 1
+			continue
+		if i + 1 >= len(options):
+			exit_with_help('Error: Missing Value! (' + options[i] + ')')
+		if options[i] == '-in':
+			inputpath = options[i+1]
+		elif options[i] == '-scripts':
+			scriptpath = options[i+1]
+		elif options[i] == '-outlierRemoval':
+			if options[i+1] not in [ 'script', 'native', 'check' ]:
+				exit_with_help('Error: Unknown Outlier Removal! (' + options[i+1] + ')')
+			outlierMode = options[i+1]
+		elif options[i] == '-featureGeneration':
+			if options[i+1] not in [ 'script', 'native', 'check' ]:
+				exit_with_help('Error: Unknown Feature Generation! (' + options[i+1] + ')')
+			featureMode = options[i+1]
+		elif options[i] in [ '-instances', '-instancesMain', '-subpages', '-worker', '-seed' ]:
+			if not options[i+1].isdigit():
+				exit_with_help('Error: ' + options[i] + ' is not a Number!')
+			value = int(options[i+1])
+			if options[i] == '-instances':
+				instances = value
+			elif options[i] == '-instancesMain':
+				instancesMain = value
+			elif options[i] == '-subpages':
+				subpages = value
+			elif options[i] == '-worker':
+				nr_worker = max(1, value)
+			else:
+				seed = value
+		else:
+			exit_with_help('Error: Unknown Argument! (' + options[i] + ')')
+		i = i + 2
+
+	if inputpath == None:
+		exit_with_help('Error: No Input Path!')
+	if scriptpath == None:
+		exit_with_help('Error: No Path to the Fetch Scripts!')
+	if not os.path.isdir(inputpath):
+		exit_with_help('Error: Input Path does not exist!')
+	scripts = [ 'merge-input.sh' ]
+	if outlierMode != 'native':
+		scripts.append('outlier-removal.py')
+	if featureMode != 'native':
+		scripts.append('generate-feature.py')
+	for script in scripts:
+		if not os.path.isfile(os.path.join(scriptpath, script)):
+			exit_with_help('Error: ' + script + ' not found!')
+	if nr_worker == None:
+		import multiprocessing
+		nr_worker = multiprocessing.cpu_count()
+
+	# Same layout as ProcessWSC.sh, next to the input
+	parentpath = os.path.dirname(os.path.normpath(inputpath))
+	scratch_path = os.path.join(parentpath, 'wsc_scratch')
+	features_path = os.path.join(parentpath, 'wsc_features') + '/'
+	main_path = os.path.join(parentpath, 'wsc_main_merged')
+	outlier_main_path = os.path.join(parentpath, 'wsc_main_outlier')
+	mainLock = threading.Lock()
+	# Sites where the native outlier removal differs from outlier-removal.py
+	outlierMismatches = []
+	# Feature files where the native features differ from generate-feature.py
+	featureMismatches = []
+
+	if not quiet:
+		print('WSC: Make sure that the fetches are clean!')
+		print('WSC: Main pages can be stored beforehand! Be aware of possible duplicates!')
+	for path in [ os.path.join(scratch_path, 'done'), os.path.join(scratch_path, 'logs'), main_path ]:
+		if not os.path.isdir(path):
+			os.makedirs(path)
+
+	# a) Define WSC List, sites of an interrupted run are not processed again
+	sites = siteNames(inputpath)
+	done = set(os.listdir(os.path.join(scratch_path, 'done')))
+	jobs = [ (site, sites[site]) for site in sorted(sites) if site not in done ]
+	if done & set(sites):
+		log('Resuming: {0} of {1} Sites already processed'.format(len(done & set(sites)), len(sites)))
+
+	# b) For each Site perform the steps, up to nr_worker sites at once
+	# The process pool is started before the threads of the sites
+	featurePool = Pool(nr_worker) if featureMode != 'script' else None
+	try:
+		pool = ThreadPool(max(1, min(nr_worker, len(jobs))))
+		try:
+			errors = [ error for error in pool.map(processSiteSafe, jobs, 1) if error is not None ]
+		finally:
+			pool.close()
+			pool.join()
+		if errors:
+			for error in errors:
+				print('Error: ' + error)
+			print('Error: Stopped! Finished Sites are skipped when started again (' + scratch_path + ')')
+			raise SystemExit
+
+		if os.path.isdir(os.path.join(main_path, form)) and not os.listdir(os.path.join(main_path, form)):
+			os.rmdir(os.path.join(main_path, form))
+
+		# c) Process Mainpages Set
+		log('Outlier-Removal Mainpages')
+		log_file = os.path.join(scratch_path, 'logs', 'mainPages.log')
+		try:
+			if outlierMode == 'native':
+				nativeOutlierRemoval(os.path.join(main_path, form), outlier_main_path, 10, None, random.Random('{0}:mainPages'.format(seed)), log_file)
+			else:
+				outlierRemoval(main_path + '/', outlier_main_path + '/', 'NO', 10, log_file)
+				if outlierMode == 'check':
+					checkOutlierRemoval('mainPages', os.path.join(main_path, form), os.path.join(outlier_main_path, form + '-outlierfree'), 'NO', 10, log_file)
+			log('Feature Generation Mainpages')
+			generateFeatures(outlier_main_path + '/', instancesMain, 'mainPages', log_file)
+		except Exception as e:
+			flog = open(log_file, 'a')
+			flog.write(traceback.format_exc())
+			flog.close()
+			print('Error: mainPages: {0}'.format(e))
+			raise SystemExit
+	finally:
+		# Every path closes the process pool and waits for its workers
+		if featurePool is not None:
+			featurePool.close()
+			featurePool.join()
+	if outlierMismatches or featureMismatches:
+		# The logs list the differences, they are kept next to the features
+		check_path = os.path.join(parentpath, 'wsc_check')
+		if os.path.isdir(check_path):
+			shutil.rmtree(check_path)
+		shutil.copytree(os.path.join(scratch_path, 'logs'), check_path)
+	if outlierMode == 'check':
+		if outlierMismatches:
+			print('Outlier Removal: native differs from outlier-removal.py for ' + ', '.join(sorted(outlierMismatches)) + ' (see ' + check_path + ')')
+		else:
+			print('Outlier Removal: native selects the same Pages & Instances as outlier-removal.py')
+	if featureMode == 'check':
+		if featureMismatches:
+			print('Feature Generation: native differs from generate-feature.py for ' + ', '.join(sorted(featureMismatches)) + ' (see ' + check_path + ')')
+		else:
+			print('Feature Generation: native computes the same Features as generate-feature.py')
+	shutil.rmtree(scratch_path)
+
+	if not quiet:
+		print('WSC: Excute Evaluation Scripts now!')
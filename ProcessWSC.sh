@@ -1,5 +1,7 @@
 #!/bin/bash
 
+# ProcessWSC.py runs the same steps for several sites in parallel and can resume
+
 #Initially:
 #Check/Clean-fetches
 echo "WSC: Make sure that the fetches are clean!"
@@ -0,0 +1,645 @@
+#!/usr/bin/env python
+
+# Backends for cross validation, training and testing used by easy_WSC.py
+#   subprocess: runs the (patched) libSVM binaries on the text files of each fold
+#   inprocess: uses libSVM's python bindings on the in-memory instances of each fold,
+#              the grid search reuses one precomputed kernel per gamma for all values of c
+#   approximate: maps the in-memory instances through an approximation of the RBF kernel
+#              (random Fourier features or Nystroem) and trains a linear model on the mapped
+#              features (one-vs-rest least squares with ridge 1/c), time and memory grow linearly
+#              with the instances; the search reuses the mapping and its Gram matrices per gamma
+#
+# Searches (inprocess & approximate only):
+#   grid: cross validation of every grid point on all training instances, like grid.py
+#   halving: successive halving, all grid points are tried on a small stratified subsample
+#            and only the best third is promoted to a three times larger one, until the
+#            remaining points are cross validated on all training instances
+#
+# Every backend offers the same calls:
+#   gridSearch(training, status_file, gnuplot_file, workers, region=None, known=None) -> (c, g, rate)
+#     region ((c_first, c_last), (g_first, g_last)) limits the search to these indices of the grid
+#     known {(log2c, log2g): rate} are CV rates of grid points on the same training data (e.g. from
+#     wsc_searchstore.py), the points of the search that are known are written to the status file
+#     and not cross validated again
+#   train(training, model_file, c, g) -> model
+#   predict(testing, model, predict_file)
+#   loadModel(model_file) -> model
+#   identity() -> (files, settings) the results depend on, for the cache of wsc_cache.py
+#   rateIdentity() -> (files, settings) the CV rate of a grid point depends on, for wsc_searchstore.py
+# training/testing are filenames if usesFiles is set, (labels, features) arrays otherwise.
+# The prediction file always contains one "predicted,real" line per instance.
+
+from subprocess import *
+from multiprocessing.pool import ThreadPool
+from ctypes import c_double
+import sys, os, re
+import numpy as np
+
+backends = [ 'subprocess', 'inprocess', 'approximate' ]
+searches = [ 'grid', 'halving' ]
+kernelMaps = [ 'fourier', 'nystroem' ]
+
+# Memory (bytes) the precomputed kernels of the searches running at once may take, a search of n
+# instances holds about kernelBytes * n^2: the distances, the kernel of a gamma and libSVM's copy of it
+kernelMemory = 1 << 30
+kernelBytes = 36
+
+# Dimension of the approximate kernel's feature map, rows that are mapped at once
+approximateComponents = 1000
+mapChunk = 4096
+
+# Successive halving: promote the best 1/halvingRate of the grid points to halvingRate times
+# more instances, the smallest subsample keeps at least halvingMinimum instances
+halvingRate = 3
+halvingMinimum = 100
+
+def loadSvmutil(svmpath):
+	# Prefer the packaged bindings, fall back to the python folder of the libSVM path
+	try:
+		from libsvm import svmutil
+	except ImportError:
+		sys.path.append(os.path.join(svmpath, 'python'))
+		try:
+			import svmutil
+		except ImportError:
+			print('You need the python bindings of libSVM! (pip install libsvm-official)')
+			sys.exit()
+	return svmutil
+
+def gridRange(option):
+	# Same sequence as grid.py's range_f, None if the parameter is not searched
+	if option == 'null':
+		return [ None ]
+	begin, end, step = map(float, option.split(','))
+	seq = []
+	while True:
+		if step > 0 and begin > end: break
+		if step < 0 and begin < end: break
+		seq.append(begin)
+		begin = begin + step
+	return seq
+
+def squaredDistances(features):
+	# Pairwise squared euclidean distances in libSVM's RBF form |x|^2 + |y|^2 - 2xy
+	features = np.asarray(features, dtype=np.float64)
+	square = np.einsum('ij,ij->i', features, features)
+	distances = np.dot(features, features.T)
+	distances *= -2
+	distances += square[:, None]
+	distances += square[None, :]
+	return distances
+
+def stratifiedOrder(labels, seed=0):
+	# Random order of instances whose every prefix keeps the class proportions
+	labels = np.asarray(labels)
+	order = np.random.RandomState(seed).permutation(len(labels))
+	position = np.empty(len(labels))
+	for label in np.unique(labels):
+		members = order[labels[order] == label]
+		position[members] = (np.arange(len(members)) + 0.5) / len(members)
+	return order[np.argsort(position[order], kind='mergesort')]
+
+def kernelMap(kind, features, gamma, components, seed=0):
+	# Parameters of a feature map whose inner products approximate the RBF kernel exp(-gamma |x-y|^2)
+	rng = np.random.RandomState(seed)
+	if kind == 'fourier':
+		# Random Fourier features: sqrt(2/D) cos(xW + b), W ~ N(0, 2 gamma), b ~ U(0, 2 pi)
+		return { 'kind': np.array(kind), 'weights': rng.normal(0, np.sqrt(2 * gamma), (features.shape[1], components)),
+		         'offset': rng.uniform(0, 2 * np.pi, components) }
+	# Nystroem: kernel with random training instances (landmarks), whitened by the landmarks' kernel
+	landmarks = np.asarray(features[np.sort(rng.choice(len(features), min(components, len(features)), replace=False))], np.float64)
+	values, vectors = np.linalg.eigh(np.exp(-gamma * np.maximum(squaredDistances(landmarks), 0)))
+	keep = values > 1e-12 * values.max()
+	return { 'kind': np.array(kind), 'gamma': np.array(gamma), 'landmarks': landmarks,
+	         'normalization': vectors[:, keep] / np.sqrt(values[keep]) }
+
+def mapFeatures(mapping, features):
+	# Mapped features of a chunk of instances
+	features = np.asarray(features, dtype=np.float64)
+	if str(mapping['kind']) == 'fourier':
+		mapped = np.dot(features, mapping['weights'])
+		mapped += mapping['offset']
+		np.cos(mapped, out=mapped)
+		mapped *= np.sqrt(2.0 / mapped.shape[1])
+		return mapped
+	landmarks = mapping['landmarks']
+	distances = np.dot(features, landmarks.T)
+	distances *= -2
+	distances += np.einsum('ij,ij->i', features, features)[:, None]
+	distances += np.einsum('ij,ij->i', landmarks, landmarks)[None, :]
+	np.maximum(distances, 0, out=distances)
+	distances *= -float(mapping['gamma'])
+	np.exp(distances, out=distances)
+	return np.dot(distances, mapping['normalization'])
+
+def regionRange(c_seq, g_seq, region):
+	# Grid points of c and g inside a region, the whole grid without region
+	if region is None:
+		return c_seq, g_seq
+	(c_first, c_last), (g_first, g_last) = region
+	return c_seq[c_first:c_last+1], g_seq[g_first:g_last+1]
+
+class SearchHistory(object):
+	# Grid search results of folds that are done, decides which region later folds search.
+	# Later folds only skip grid points, their parameters still come from their own search.
+	# The region only depends on the first fold's search (which runs alone), so every later fold
+	# searches the same region whatever order parallel folds finish in.
+
+	def __init__(self, c_seq, g_seq, margin=10.0, seed=2):
+		self.c_seq = c_seq
+		self.g_seq = g_seq
+		# CV rate below a fold's best at which grid points count as clearly poor
+		self.margin = margin
+		# grid steps around the first fold's optimum that are always searched
+		self.seed = seed
+		# fold -> (rates, best)
+		self.searches = {}
+
+	def add(self, fold, rates, best):
+		# rates {(log2c, log2g): rate} and best (log2c, log2g) of a finished search
+		self.searches[fold] = (dict(rates), best)
+
+	def point(self, c, g):
+		# (log2c, log2g) of the parameters returned by gridSearch
+		log2c = min(self.c_seq, key=lambda x: 0 if x is None else abs(2.0**x - c))
+		log2g = min(self.g_seq, key=lambda x: 0 if x is None else abs(2.0**x - g))
+		return (log2c, log2g)
+
+	def region(self):
+		# None (whole grid) until the first search is done
+		if not self.searches:
+			return None
+		# seed around the optimum of the first fold
+		rates, (c, g) = self.searches[min(self.searches)]
+		c_index = [ self.c_seq.index(c) - self.seed, self.c_seq.index(c) + self.seed ]
+		g_index = [ self.g_seq.index(g) - self.seed, self.g_seq.index(g) + self.seed ]
+		# keep every point that was close to its best (plus a step around it)
+		if rates:
+			top = max(rates.values())
+			for (c, g), rate in rates.items():
+				if rate >= top - self.margin and c in self.c_seq and g in self.g_seq:
+					c_index += [ self.c_seq.index(c) - 1, self.c_seq.index(c) + 1 ]
+					g_index += [ self.g_seq.index(g) - 1, self.g_seq.index(g) + 1 ]
+		return self.clip(((min(c_index), max(c_index)), (min(g_index), max(g_index))))
+
+	def expand(self, region, best):
+		# Widens a region whose best point lies on one of its borders, None if nothing to widen
+		(c_first, c_last), (g_first, g_last) = region
+		c = self.c_seq.index(best[0]); g = self.g_seq.index(best[1])
+		if c == c_first: c_first -= self.seed
+		if c == c_last: c_last += self.seed
+		if g == g_first: g_first -= self.seed
+		if g == g_last: g_last += self.seed
+		expanded = self.clip(((c_first, c_last), (g_first, g_last)))
+		if expanded == region:
+			return None
+		return expanded
+
+	def clip(self, region):
+		(c_first, c_last), (g_first, g_last) = region
+		return ((max(0, c_first), min(len(self.c_seq)-1, c_last)), (max(0, g_first), min(len(self.g_seq)-1, g_last)))
+
+def readGridStatus(status_file):
+	# Results of a previous (possibly interrupted) run in grid.py's -out format
+	done = {}
+	if not os.path.isfile(status_file):
+		return done
+	pattern = re.compile(r'rate=([0-9.\-]+)')
+	fstatus = open(status_file, 'r')
+	for line in fstatus:
+		rate = pattern.search(line)
+		if rate is None:
+			continue
+		c = re.search(r'log2c=([0-9.\-]+)', line)
+		g = re.search(r'log2g=([0-9.\-]+)', line)
+		done[(c and float(c.group(1)), g and float(g.group(1)))] = float(rate.group(1))
+	fstatus.close()
+	return done
+
+def writeGridStatus(status_file, results):
+	# Appends ((log2c, log2g), rate) results in grid.py's -out format
+	fstatus = open(status_file, 'a')
+	for (c, g), rate in results:
+		status = []
+		if c is not None: status.append('log2c={0}'.format(c))
+		if g is not None: status.append('log2g={0}'.format(g))
+		status.append('rate={0}'.format(rate))
+		fstatus.write(' '.join(status) + '\n')
+	fstatus.close()
+
+def subprocessTools(svmpath):
+	# (name, path) of the libSVM tools SubprocessBackend runs, checked by Options.check()
+	return [ ('svm-train executable', os.path.join(svmpath, 'svm-train-q')),
+	         ('svm-predict executable', os.path.join(svmpath, 'svm-predict')),
+	         ('grid_patched.py', os.path.join(svmpath, './tools/grid_patched.py')) ]
+
+class SubprocessBackend(object):
+	name = 'subprocess'
+	usesFiles = True
+	# wsc_timing.Timer that records the tools, set by easy_WSC.py
+	timer = None
+
+	def __init__(self, svmpath, gnuplot_exe, grid_option, log2c, log2g, quiet):
+		self.c_seq = gridRange(log2c)
+		self.g_seq = gridRange(log2g)
+		self.c_step = None if log2c == 'null' else float(log2c.split(',')[2])
+		self.g_step = None if log2g == 'null' else float(log2g.split(',')[2])
+		self.svmtrain_exe_q, self.svmpredict_exe, self.grid_py = [ filename for _, filename in subprocessTools(svmpath) ]
+		self.gnuplot_exe = gnuplot_exe
+		self.grid_option = grid_option
+		self.quiet = quiet
+
+	def gridSearch(self, training_file, status_file, gnuplot_file, workers, region=None, known=None):
+		option = self.grid_option + ' -worker ' + str(workers)
+		c_seq, g_seq = regionRange(self.c_seq, self.g_seq, region)
+		if known:
+			# grid.py resumes the known points of the region from the status file
+			done = readGridStatus(status_file)
+			writeGridStatus(status_file, [ ((c, g), known[(c, g)]) for c in c_seq for g in g_seq if (c, g) in known and (c, g) not in done ])
+		if region is not None:
+			# later options override the grid of grid_option
+			if self.c_step is not None:
+				option += ' -log2c {0},{1},{2}'.format(c_seq[0], c_seq[-1], self.c_step)
+			if self.g_step is not None:
+				option += ' -log2g {0},{1},{2}'.format(g_seq[0], g_seq[-1], self.g_step)
+		# check if we can resume
+		if os.path.isfile(status_file):
+			option += ' -resume "{0}" -out "{0}" -png "{1}" '.format(status_file, gnuplot_file)
+		else:
+			option += ' -out "{0}" -png "{1}" '.format(status_file, gnuplot_file)
+		cmd = 'python {0} -svmtrain "{1}" -gnuplot "{2}" {3} "{4}"'.format(self.grid_py, self.svmtrain_exe_q, self.gnuplot_exe, option, training_file)
+		lines = self.execute(cmd, stdout = PIPE)[0].splitlines()
+		last_line = lines[-1] if lines else ''
+		c,g,rate = map(float,last_line.split())
+		return (c,g,rate)
+
+	def train(self, training_file, model_file, c, g):
+		cmd = '{0} -c {1} -g {2} "{3}" "{4}"'.format(self.svmtrain_exe_q, c, g, training_file, model_file)
+		self.execute(cmd, stdout = PIPE)
+		return model_file
+
+	def predict(self, testing_file, model_file, predict_file, output=None):
+		# the accuracy is written to output (default sys.stdout)
+		cmd = '{0} "{1}" "{2}" "{3}"'.format(self.svmpredict_exe, testing_file, model_file, predict_file)
+		lines = self.execute(cmd, stdout = PIPE, universal_newlines = True)[0]
+		if not self.quiet:
+			(output or sys.stdout).write(lines)
+
+	def loadModel(self, model_file):
+		return model_file
+
+	def identity(self):
+		return [ self.svmtrain_exe_q, self.svmpredict_exe, self.grid_py ], [ self.name, self.grid_option ]
+
+	def rateIdentity(self):
+		# grid.py cross validates with 5 folds unless grid_option has -v
+		folds = re.findall(r'-v\s+(\S+)', self.grid_option)
+		return [ self.svmtrain_exe_q, self.grid_py ], [ self.name, folds[-1] if folds else '5' ]
+
+	def execute(self, cmd, **options):
+		if self.timer is not None:
+			return self.timer.run(cmd, **options)
+		return Popen(cmd, shell = True, **options).communicate()
+
+class InprocessBackend(object):
+	name = 'inprocess'
+	usesFiles = False
+	# searches running at once (parallel folds), they share kernelMemory, set by Evaluator.evaluation()
+	concurrentSearches = 1
+
+	def __init__(self, svmpath, log2c, log2g, nr_fold, quiet, search='grid'):
+		self.svmutil = loadSvmutil(svmpath)
+		self.c_seq = gridRange(log2c)
+		self.g_seq = gridRange(log2g)
+		self.nr_fold = nr_fold
+		self.quiet = quiet
+		self.search = search
+		# status file -> (full cross validations, grid points, CV rate given up) of halving searches
+		self.searchReports = {}
+
+	def svmData(self, data):
+		# Bindings without scipy support only take lists
+		labels, features = data
+		if getattr(self.svmutil, 'scipy', None) is None:
+			return labels.tolist(), features.tolist()
+		return labels, features
+
+	def gridSearch(self, training, status_file, gnuplot_file, workers, region=None, known=None):
+		c_seq, g_seq = regionRange(self.c_seq, self.g_seq, region)
+		if self.search == 'halving':
+			return self.halvingSearch(training, status_file, workers, c_seq, g_seq, known)
+		done = readGridStatus(status_file)
+		points = [ (c, g) for c in c_seq for g in g_seq ]
+		jobs = self.unknownJobs([ job for job in points if job not in done ], known, done, status_file)
+		self.crossValidateJobs(training, jobs, done, status_file, workers)
+		return self.bestParameters(training, done, points)
+
+	def unknownJobs(self, jobs, known, done, status_file):
+		# Known jobs are only written to the status file, the others are cross validated
+		if not known:
+			return jobs
+		self.writeStatus(status_file, done, [ (job, known[job]) for job in jobs if job in known ])
+		return [ job for job in jobs if job not in known ]
+
+	def halvingSearch(self, training, status_file, workers, c_seq, g_seq, known=None):
+		labels, features = training
+		n = len(labels)
+		done = readGridStatus(status_file)
+		candidates = [ (c, g) for c in c_seq for g in g_seq ]
+		order = stratifiedOrder(labels)
+		minimum = min(n, max(halvingMinimum, 2 * self.nr_fold * len(np.unique(labels))))
+		rungs = 0
+		while halvingRate**(rungs+1) <= len(candidates) and n // halvingRate**(rungs+1) >= minimum:
+			rungs += 1
+
+		# Subsample rungs, the best ranked dropped point of each rung is checked on all instances
+		checks = []
+		for rung in range(rungs):
+			subset = order[:n // halvingRate**(rungs-rung)]
+			rates = {}
+			self.crossValidateJobs((labels[subset], features[subset]), candidates, rates, None, workers)
+			# stable sort keeps the grid order on ties
+			ranked = sorted(candidates, key=lambda job: -rates[job])
+			keep = max(1, -(-len(candidates) // halvingRate))
+			candidates = ranked[:keep]
+			if len(ranked) > keep:
+				checks.append(ranked[keep])
+
+		# full cross validations of the last rung and the checks, known rates are reused
+		jobs = self.unknownJobs([ job for job in candidates + checks if job not in done ], known, done, status_file)
+		self.crossValidateJobs(training, jobs, done, status_file, workers)
+		c, g, rate = self.bestParameters(training, done, candidates)
+		# The checks only measure the CV rate given up by dropping points early
+		givenUp = max([ 0.0 ] + [ done[job] - rate for job in checks ])
+		self.searchReports[status_file] = (len(set(candidates + checks)), len(c_seq) * len(g_seq), givenUp)
+		return (c, g, rate)
+
+	def crossValidateJobs(self, training, jobs, done, status_file, workers):
+		if jobs and self.precomputable(training):
+			self.kernelGridSearch(training, jobs, done, status_file, workers)
+		elif jobs:
+			labels, instances = self.svmData(training)
+			problem = self.svmutil.svm_problem(labels, instances)
+			self.rbfGridSearch(problem, labels, jobs, done, status_file, workers)
+
+	def bestParameters(self, training, done, jobs=None):
+		# Same choice as grid.py: best rate, smaller c on ties
+		best_rate = -1; best_c = None; best_g = None
+		for c in self.c_seq:
+			for g in self.g_seq:
+				if jobs is not None and (c, g) not in jobs:
+					continue
+				rate = done[(c, g)]
+				if rate > best_rate or (rate == best_rate and g == best_g and c < best_c):
+					best_rate = rate; best_c = c; best_g = g
+		# libSVM defaults for parameters that are not searched
+		c = 1.0 if best_c is None else 2.0**best_c
+		if best_g is None:
+			g = self.kernelGamma(training[1])
+		else:
+			g = 2.0**best_g
+		return (c, g, best_rate)
+
+	def rbfGridSearch(self, problem, labels, jobs, done, status_file, workers):
+		# Every grid point computes its kernel from the instances
+		def crossValidation(job):
+			option = '-q'
+			if job[0] is not None:
+				option += ' -c {0}'.format(2.0**job[0])
+			if job[1] is not None:
+				option += ' -g {0}'.format(2.0**job[1])
+			return self.crossValidation(problem, labels, option)
+
+		# libSVM releases the GIL, grid points are evaluated by parallel threads
+		pool = ThreadPool(max(1, min(workers, len(jobs))))
+		try:
+			rates = pool.map(crossValidation, jobs, 1)
+		finally:
+			pool.close()
+			pool.join()
+		self.writeStatus(status_file, done, zip(jobs, rates))
+
+	def precomputable(self, training):
+		# Kernel matrices are handed over as sparse matrices, which needs scipy
+		n = len(training[0])
+		return getattr(self.svmutil, 'scipy', None) is not None and 0 < n and kernelBytes * n * n * self.concurrentSearches <= kernelMemory
+
+	def kernelGamma(self, features):
+		# libSVM's default gamma: 1 / highest feature index that is set
+		used = np.flatnonzero(np.asarray(features).any(axis=0))
+		return 1.0 / (used[-1] + 1) if len(used) else 1.0
+
+	def kernelGridSearch(self, training, jobs, done, status_file, workers):
+		# Distances are computed once, the kernel of each gamma is shared by all values of c
+		labels, features = training
+		labels = np.asarray(labels, dtype=np.float64)
+		distances = squaredDistances(features)
+		gammas = []
+		for c, g in jobs:
+			if g not in gammas:
+				gammas.append(g)
+		for g in gammas:
+			gamma = self.kernelGamma(features) if g is None else 2.0**g
+			problem = self.kernelProblem(labels, distances, gamma)
+			if g == gammas[-1]:
+				distances = None
+			cs = [ c for c, job_g in jobs if job_g == g ]
+
+			def crossValidation(c):
+				option = '-q -t 4'
+				if c is not None:
+					option += ' -c {0}'.format(2.0**c)
+				return self.crossValidation(problem, labels, option)
+
+			pool = ThreadPool(max(1, min(workers, len(cs))))
+			try:
+				rates = pool.map(crossValidation, cs, 1)
+			finally:
+				pool.close()
+				pool.join()
+			# written per gamma, an interrupted search resumes from here
+			self.writeStatus(status_file, done, [ ((c, g), rate) for c, rate in zip(cs, rates) ])
+			# libSVM's copy of the kernel is freed before the next one is built
+			problem = None
+
+	def kernelProblem(self, labels, distances, gamma):
+		# libSVM's precomputed format: column 0 holds the serial number, column j the kernel with instance j
+		sparse = self.svmutil.sparse
+		l = len(labels)
+		kernel = np.empty((l, l+1))
+		kernel[:, 0] = np.arange(1, l+1)
+		np.multiply(distances, -gamma, out=kernel[:, 1:])
+		np.exp(kernel[:, 1:], out=kernel[:, 1:])
+		# explicit zeros have to be kept, the kernel is looked up by position
+		# the matrix uses the kernel's buffer, only svm_problem copies it (freed with the kernel on return)
+		index = np.int32 if l*(l+1) < 2**31 else np.int64
+		matrix = sparse.csr_matrix((kernel.reshape(-1), np.tile(np.arange(l+1, dtype=index), l), np.arange(0, l*(l+1)+1, l+1, dtype=index)), shape=(l, l+1), copy=False)
+		return self.svmutil.svm_problem(labels, matrix, isKernel=True)
+
+	def writeStatus(self, status_file, done, results):
+		# Without status file the rates are only collected in done
+		results = list(results)
+		for job, rate in results:
+			done[job] = rate
+		if status_file is not None:
+			writeGridStatus(status_file, results)
+
+	def crossValidation(self, problem, labels, option):
+		# svm_train(..., '-v') prints its accuracy even with -q
+		svmutil = self.svmutil
+		param = svmutil.svm_parameter(option)
+		if param.gamma == 0:
+			param.gamma = 1.0 / problem.n
+		target = (c_double * problem.l)()
+		svmutil.libsvm.svm_set_print_string_function(param.print_func)
+		svmutil.libsvm.svm_cross_validation(problem, param, self.nr_fold, target)
+		return svmutil.evaluations(labels, target[:problem.l])[0]
+
+	def train(self, training, model_file, c, g):
+		labels, instances = self.svmData(training)
+		model = self.svmutil.svm_train(labels, instances, '-q -c {0} -g {1}'.format(c, g))
+		self.svmutil.svm_save_model(model_file, model)
+		return model
+
+	def predict(self, testing, model, predict_file, output=None):
+		labels, instances = self.svmData(testing)
+		predicted, (accuracy, _, _), _ = self.svmutil.svm_predict(labels, instances, model, '-q')
+		if not self.quiet:
+			# same line as svm_predict
+			(output or sys.stdout).write('Accuracy = %g%% (%d/%d) (classification)\n' % (accuracy, int(round(len(labels)*accuracy/100)), len(labels)))
+		fpredict = open(predict_file, 'w')
+		for pred, real in zip(predicted, labels):
+			fpredict.write('%d,%d\n' % (pred, real))
+		fpredict.close()
+
+	def loadModel(self, model_file):
+		return self.svmutil.svm_load_model(model_file)
+
+	def identity(self):
+		library = getattr(self.svmutil.libsvm, '_name', None) or ''
+		files = [ library ] if os.path.isfile(library) else []
+		return files, [ self.name, library, self.search, self.nr_fold, self.c_seq, self.g_seq, halvingRate, halvingMinimum ]
+
+	def rateIdentity(self):
+		files, settings = self.identity()
+		return files, [ self.name, settings[1], self.nr_fold ]
+
+class ApproximateBackend(InprocessBackend):
+	# Grid and halving search of InprocessBackend, cross validation and models use the approximate kernel
+	name = 'approximate'
+	usesFiles = False
+
+	def __init__(self, log2c, log2g, nr_fold, quiet, search='grid', kernel='fourier', components=approximateComponents):
+		self.c_seq = gridRange(log2c)
+		self.g_seq = gridRange(log2g)
+		self.nr_fold = nr_fold
+		self.quiet = quiet
+		self.search = search
+		self.kernel = kernel
+		self.components = components
+		self.searchReports = {}
+
+	def targets(self, labels):
+		# (classes, class index of every instance, one-vs-rest targets +1/-1)
+		classes, index = np.unique(np.asarray(labels), return_inverse=True)
+		targets = -np.ones((len(index), len(classes)))
+		targets[np.arange(len(index)), index] = 1
+		return classes, index, targets
+
+	def gramMatrices(self, mapping, features, targets, parts, count):
+		# (sum zz', sum zy') of the mapped instances of every part 0..count-1
+		gram = None
+		for start in range(0, len(features), mapChunk):
+			mapped = mapFeatures(mapping, features[start:start+mapChunk])
+			chunkParts = parts[start:start+mapChunk]
+			if gram is None:
+				gram = np.zeros((count, mapped.shape[1], mapped.shape[1]))
+				cross = np.zeros((count, mapped.shape[1], targets.shape[1]))
+			for part in np.unique(chunkParts):
+				rows = chunkParts == part
+				gram[part] += np.dot(mapped[rows].T, mapped[rows])
+				cross[part] += np.dot(mapped[rows].T, targets[start:start+mapChunk][rows])
+		return gram, cross
+
+	def crossValidateJobs(self, training, jobs, done, status_file, workers):
+		if not jobs:
+			return
+		labels, features = training
+		_, index, targets = self.targets(labels)
+		n = len(index)
+		# Every grid point uses the same folds, each keeps the class proportions
+		parts = np.empty(n, np.intp)
+		parts[stratifiedOrder(labels)] = np.arange(n) % self.nr_fold
+		gammas = []
+		for c, g in jobs:
+			if g not in gammas:
+				gammas.append(g)
+
+		def crossValidation(g):
+			# The mapping and the Gram matrices of a gamma are shared by all values of c
+			cs = [ c for c, job_g in jobs if job_g == g ]
+			mapping = kernelMap(self.kernel, features, self.kernelGamma(features) if g is None else 2.0**g, self.components)
+			gram, cross = self.gramMatrices(mapping, features, targets, parts, self.nr_fold)
+			correct = dict((c, 0) for c in cs)
+			for part in range(self.nr_fold):
+				# Eigenvectors of the training Gram matrix solve the ridge problem of every c
+				values, vectors = np.linalg.eigh(gram.sum(axis=0) - gram[part])
+				projected = np.dot(vectors.T, cross.sum(axis=0) - cross[part])
+				held = np.flatnonzero(parts == part)
+				for start in range(0, len(held), mapChunk):
+					rows = held[start:start+mapChunk]
+					rotated = np.dot(mapFeatures(mapping, features[rows]), vectors)
+					for c in cs:
+						ridge = 1.0 if c is None else 2.0**-c
+						scores = np.dot(rotated, projected / (values + ridge)[:, None])
+						correct[c] += np.count_nonzero(scores.argmax(axis=1) == index[rows])
+			return [ ((c, g), 100.0 * correct[c] / n) for c in cs ]
+
+		# numpy releases the GIL, gammas are evaluated by parallel threads
+		pool = ThreadPool(max(1, min(workers, len(gammas))))
+		try:
+			rates = pool.map(crossValidation, gammas, 1)
+		finally:
+			pool.close()
+			pool.join()
+		for results in rates:
+			self.writeStatus(status_file, done, results)
+
+	def train(self, training, model_file, c, g):
+		labels, features = training
+		classes, _, targets = self.targets(labels)
+		mapping = kernelMap(self.kernel, features, g, self.components)
+		gram, cross = self.gramMatrices(mapping, features, targets, np.zeros(len(features), np.intp), 1)
+		model = dict(mapping)
+		model['classes'] = classes
+		model['coef'] = np.linalg.solve(gram[0] + np.eye(gram.shape[1]) / c, cross[0])
+		fmodel = open(model_file, 'wb')
+		np.savez(fmodel, **model)
+		fmodel.close()
+		return model
+
+	def predict(self, testing, model, predict_file, output=None):
+		labels, features = testing
+		predicted = [ model['classes'][np.dot(mapFeatures(model, features[start:start+mapChunk]), model['coef']).argmax(axis=1)]
+		              for start in range(0, len(features), mapChunk) ]
+		predicted = np.concatenate(predicted) if predicted else np.zeros(0)
+		if not self.quiet:
+			correct = np.count_nonzero(predicted == np.asarray(labels))
+			# same line as svm-predict
+			(output or sys.stdout).write('Accuracy = {0:g}% ({1}/{2}) (classification)\n'.format(100.0 * correct / max(len(labels), 1), correct, len(labels)))
+		fpredict = open(predict_file, 'w')
+		for pred, real in zip(predicted.tolist(), np.asarray(labels).tolist()):
+			fpredict.write('%d,%d\n' % (pred, real))
+		fpredict.close()
+
+	def loadModel(self, model_file):
+		stored = np.load(model_file)
+		model = dict((key, stored[key]) for key in stored.files)
+		stored.close()
+		return model
+
+	def identity(self):
+		return [], [ self.name, self.kernel, self.components, self.search, self.nr_fold, self.c_seq, self.g_seq, halvingRate, halvingMinimum ]
+
+	def rateIdentity(self):
+		return [], [ self.name, self.kernel, self.components, self.nr_fold ]
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+# Binary cache of parsed and scaled WSC datasets, kept next to the input directory
+#   parsed/<fingerprint>.labels.npy|.features.npy : a parsed source file (unscaled, float64)
+#   scaled/<key>/labels.npy|features.npy|range     : a dataset as loaded by easy_WSC.py
+#   domains/<key>.kept.npy|.skipped.npy            : background filter of a domain list and foreground
+#   search/<key>.json                               : grid search result & status file of a fold
+#   model/<key>, predict/<key>                      : model and prediction files of a fold
+#   search.sqlite                                   : CV rate of every grid point (see wsc_searchstore.py)
+# Folds are keyed by the content of their training & testing data, (c, g) and the backend,
+# an unchanged fold is copied from the cache instead of searched, trained and tested again.
+# Fingerprints are content hashes of the source files, remembered per (size, mtime) in files.json.
+# Arrays are memory-mapped on load. Entries are written under a temporary name and renamed,
+# so concurrent runs never see partial entries.
+# Entries are never evicted (easy_WSC.py only uses the cache with -cache YES), removing the
+# directory clears the cache.
+
+import os, json, hashlib, tempfile, shutil
+import numpy as np
+from wsc_scale import parseInstances, blockRange
+
+# Bump if the stored format or its meaning changes
+version = 1
+
+def defaultPath(inputpath):
+	# wsc_features/ -> wsc_cache/
+	return os.path.join(os.path.dirname(os.path.normpath(inputpath)), 'wsc_cache')
+
+def makedirs(path):
+	if not os.path.isdir(path):
+		try:
+			os.makedirs(path)
+		except OSError:
+			if not os.path.isdir(path):
+				raise
+
+class FeatureCache(object):
+
+	def __init__(self, path=None):
+		# Without a path parsed files are only kept for the current run
+		self.path = path
+		self.parsed = {}
+		self.ranges = {}
+		self.fingerprints = None
+
+	def storedFingerprints(self):
+		# {filename: [size, mtime, hash]} of files.json
+		fingerprints = {}
+		if self.path is not None and os.path.isfile(os.path.join(self.path, 'files.json')):
+			try:
+				ffiles = open(os.path.join(self.path, 'files.json'), 'r')
+				fingerprints = json.load(ffiles)
+				ffiles.close()
+			except ValueError:
+				pass
+		return fingerprints
+
+	def fingerprint(self, filename):
+		# Content hash of a file, only recomputed if size or modification time changed
+		if self.fingerprints is None:
+			self.fingerprints = self.storedFingerprints()
+		filename = os.path.abspath(filename)
+		stat = os.stat(filename)
+		entry = self.fingerprints.get(filename)
+		if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+			return entry[2]
+		digest = self.contentHash(filename)
+		self.fingerprints[filename] = [ stat.st_size, stat.st_mtime, digest ]
+		if self.path is not None:
+			makedirs(self.path)
+			# Processes with their own cache (ProcessWSC.py's pool) add files concurrently: the entry is
+			# merged into the stored ones instead of replacing them
+			fingerprints = self.storedFingerprints()
+			fingerprints[filename] = self.fingerprints[filename]
+			self.fingerprints.update(fingerprints)
+			self.writeAtomic(os.path.join(self.path, 'files.json'), json.dumps(fingerprints))
+		return digest
+
+	def key(self, *parts):
+		return hashlib.sha1(json.dumps([ version ] + list(parts), sort_keys=True).encode('utf-8')).hexdigest()
+
+	def writeAtomic(self, filename, text):
+		fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename))
+		fout = os.fdopen(fd, 'w')
+		fout.write(text)
+		fout.close()
+		os.replace(tmp, filename)
+
+	def contentHash(self, data):
+		# sha1 of a file or of (labels, features) arrays
+		sha = hashlib.sha1()
+		if isinstance(data, tuple):
+			for array in data:
+				array = np.ascontiguousarray(array)
+				sha.update(json.dumps([ str(array.dtype), array.shape ]).encode('utf-8'))
+				sha.update(array.data)
+			return sha.hexdigest()
+		fin = open(data, 'rb')
+		while True:
+			block = fin.read(1 << 20)
+			if not block: break
+			sha.update(block)
+		fin.close()
+		return sha.hexdigest()
+
+	def loadFile(self, kind, key, filename):
+		# Copies a stored file to filename, False if there is none
+		if self.path is None:
+			return False
+		entry = os.path.join(self.path, kind, key)
+		if not os.path.isfile(entry):
+			return False
+		shutil.copyfile(entry, filename)
+		return True
+
+	def storeFile(self, kind, key, filename):
+		if self.path is None:
+			return
+		entry = os.path.join(self.path, kind, key)
+		makedirs(os.path.dirname(entry))
+		fd, tmp = tempfile.mkstemp(dir=os.path.dirname(entry))
+		os.close(fd)
+		shutil.copyfile(filename, tmp)
+		os.replace(tmp, entry)
+
+	def loadResult(self, kind, key):
+		if self.path is None:
+			return None
+		entry = os.path.join(self.path, kind, key + '.json')
+		if not os.path.isfile(entry):
+			return None
+		fin = open(entry, 'r')
+		result = json.load(fin)
+		fin.close()
+		return result
+
+	def storeResult(self, kind, key, result):
+		if self.path is None:
+			return
+		entry = os.path.join(self.path, kind, key + '.json')
+		makedirs(os.path.dirname(entry))
+		self.writeAtomic(entry, json.dumps(result))
+
+	def loadParsed(self, filename):
+		# (labels, features) of a source file, parsed at most once
+		if filename in self.parsed:
+			return self.parsed[filename]
+		if self.path is None:
+			fin = open(filename, 'r')
+			data = parseInstances(fin.read())
+			fin.close()
+			# Shared between evaluations, scaling works on copies
+			data[1].flags.writeable = False
+			self.parsed[filename] = data
+			return data
+		entry = os.path.join(self.path, 'parsed', self.fingerprint(filename))
+		if os.path.isfile(entry + '.features.npy'):
+			data = (np.load(entry + '.labels.npy'), np.load(entry + '.features.npy', mmap_mode='r'))
+		else:
+			fin = open(filename, 'r')
+			labels, features = parseInstances(fin.read())
+			fin.close()
+			makedirs(os.path.dirname(entry))
+			self.saveArray(entry + '.labels.npy', labels)
+			self.saveArray(entry + '.features.npy', features)
+			data = (labels, np.load(entry + '.features.npy', mmap_mode='r'))
+		self.parsed[filename] = data
+		return data
+
+	def storeParsed(self, filename, labels, features):
+		# Parsed arrays of a file that was just written, as loadParsed would store them
+		if self.path is None:
+			return
+		entry = os.path.join(self.path, 'parsed', self.fingerprint(filename))
+		makedirs(os.path.dirname(entry))
+		self.saveArray(entry + '.labels.npy', labels)
+		self.saveArray(entry + '.features.npy', features)
+
+	def loadRange(self, filename):
+		# blockRange of a whole source file, computed at most once
+		if filename not in self.ranges:
+			self.ranges[filename] = blockRange(self.loadParsed(filename)[1])
+		return self.ranges[filename]
+
+	def loadIndices(self, key):
+		# (kept, skipped) indices of a stored background filter
+		if self.path is None:
+			return None
+		entry = os.path.join(self.path, 'domains', key)
+		if not os.path.isfile(entry + '.kept.npy'):
+			return None
+		return np.load(entry + '.kept.npy'), np.load(entry + '.skipped.npy')
+
+	def storeIndices(self, key, kept, skipped):
+		if self.path is None:
+			return
+		entry = os.path.join(self.path, 'domains', key)
+		makedirs(os.path.dirname(entry))
+		# kept is written last, loadIndices only looks for it
+		self.saveArray(entry + '.skipped.npy', skipped)
+		self.saveArray(entry + '.kept.npy', kept)
+
+	def saveArray(self, filename, array):
+		fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.npy')
+		fout = os.fdopen(fd, 'wb')
+		np.save(fout, array)
+		fout.close()
+		os.replace(tmp, filename)
+
+	def loadDataset(self, key, range_file):
+		# (labels, features) of a stored dataset, its range file is copied to range_file
+		if self.path is None:
+			return None
+		entry = os.path.join(self.path, 'scaled', key)
+		if not os.path.isfile(os.path.join(entry, 'features.npy')):
+			return None
+		shutil.copyfile(os.path.join(entry, 'range'), range_file)
+		return np.load(os.path.join(entry, 'labels.npy')), np.load(os.path.join(entry, 'features.npy'), mmap_mode='r')
+
+	def storeDataset(self, key, labels, features, range_file):
+		if self.path is None:
+			return
+		entry = os.path.join(self.path, 'scaled', key)
+		makedirs(os.path.dirname(entry))
+		tmp = tempfile.mkdtemp(dir=os.path.dirname(entry))
+		np.save(os.path.join(tmp, 'labels.npy'), labels)
+		np.save(os.path.join(tmp, 'features.npy'), features)
+		shutil.copyfile(range_file, os.path.join(tmp, 'range'))
+		try:
+			os.replace(tmp, entry)
+		except OSError:
+			# stored by a concurrent run in the meantime
+			shutil.rmtree(tmp)
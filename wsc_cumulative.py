@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# CUMULATIVE features of traces, as generate-feature.py -classifier CUMULATIVE computes them
+#   incoming count, outgoing count, outgoing size, incoming size, followed by the cumulated
+#   (signed) packet sizes interpolated at featureCount equidistant points of the total size
+# The features of many traces are computed at once: traces are padded to the length of the
+# longest trace of a batch, the interpolation is the arithmetic of np.interp for every row.
+#
+# generate() writes the feature file of a page directory ({dataSet}_{Format}, one class per page
+# in natural order) and stores its parsed arrays in wsc_cache/, so easy_WSC.py does not parse it.
+# compareFile() checks the features and lines against a file generate-feature.py wrote.
+
+import os
+import numpy as np
+try:
+	from natsort import natsorted
+except ImportError:
+	print('You need natsort! (pip install natsort)')
+	raise SystemExit
+from wsc_traces import packetSizes
+from wsc_cache import FeatureCache, defaultPath
+from wsc_scale import parseInstances
+
+# Traces per batch, bounds the padded arrays
+batchSize = 1024
+
+def interpolate(x, xp, fp, lengths):
+	# np.interp(x[i], xp[i, :lengths[i]], fp[i, :lengths[i]]) of every row, xp is nondecreasing and
+	# padded with inf, x lies within [xp[i, 0], xp[i, lengths[i]-1]]
+	rows = np.arange(len(x))[:, None]
+	# j: last xp <= x, like np.interp's binary search. A stable sort puts xp before equal x,
+	# the k-th x of a row is preceded by j+1 values of xp
+	order = np.argsort(np.concatenate((xp, x), axis=1), axis=1, kind='mergesort')
+	position = np.nonzero(order >= xp.shape[1])[1].reshape(x.shape)
+	j = position - np.arange(x.shape[1])[None, :] - 1
+	last = (lengths - 1)[:, None]
+	j = np.minimum(j, last)
+	following = np.minimum(j + 1, last)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		slope = (fp[rows, following] - fp[rows, j]) / (xp[rows, following] - xp[rows, j])
+		result = slope * (x - xp[rows, j]) + fp[rows, j]
+	exact = x == xp[rows, j]
+	result[exact] = fp[rows, j][exact]
+	end = x >= xp[rows, last]
+	result[end] = fp[rows, last].repeat(x.shape[1], axis=1)[end]
+	return result
+
+def cumulativeFeatures(traces, featureCount=100):
+	# (traces x 4 + featureCount) features of a list of packet size arrays
+	features = np.zeros((len(traces), 4 + featureCount))
+	lengths = np.array([ len(sizes) for sizes in traces ], np.intp)
+	# Similar lengths share a batch, this keeps the padding small
+	byLength = np.argsort(lengths, kind='mergesort')
+	for start in range(0, len(traces), batchSize):
+		batch = byLength[start:start+batchSize]
+		batch = batch[lengths[batch] > 0]
+		if len(batch) == 0:
+			continue
+		width = lengths[batch].max()
+		sizes = np.zeros((len(batch), width), np.int64)
+		for row, k in enumerate(batch):
+			sizes[row, :lengths[k]] = traces[k]
+		padding = np.arange(width)[None, :] >= lengths[batch][:, None]
+		incoming = sizes > 0
+		outgoing = sizes < 0
+		features[batch, 0] = incoming.sum(axis=1)
+		features[batch, 1] = outgoing.sum(axis=1)
+		features[batch, 2] = -np.where(outgoing, sizes, 0).sum(axis=1)
+		features[batch, 3] = np.where(incoming, sizes, 0).sum(axis=1)
+		cum = np.cumsum(sizes, axis=1).astype(np.float64)
+		total = np.cumsum(np.abs(sizes), axis=1).astype(np.float64)
+		total[padding] = np.inf
+		first = total[:, 0]
+		end = total[np.arange(len(batch)), lengths[batch] - 1]
+		# np.linspace(first, end, featureCount+1) of every row
+		step = (end - first) / featureCount
+		points = np.arange(featureCount + 1)[None, :] * step[:, None] + first[:, None]
+		points[:, -1] = end
+		features[batch, 4:] = interpolate(points, total, cum, lengths[batch])[:, 1:]
+	return features
+
+def formatLines(labels, features):
+	# generate-feature.py's lines: counts and sizes as integers, cumulative features as python floats
+	lines = []
+	for label, row in zip(labels.tolist(), features.tolist()):
+		items = [ '%d:%d' % (i+1, value) for i, value in enumerate(row[:4]) ]
+		items += [ '%d:%r' % (i+5, value) for i, value in enumerate(row[4:]) ]
+		lines.append('%d %s\n' % (label, ' '.join(items)))
+	return ''.join(lines)
+
+def readTraces(pagespath, instances=None):
+	# (labels, packet sizes) of the page files in natural order, the first instances of each page
+	labels = []; traces = []
+	for label, page in enumerate(natsorted(os.listdir(pagespath)), 1):
+		fin = open(os.path.join(pagespath, page), 'r')
+		lines = [ line for line in fin if line.strip() ]
+		fin.close()
+		if instances is not None:
+			lines = lines[:instances]
+		labels.extend([ label ] * len(lines))
+		# packets without size are skipped, like generate-feature.py does
+		traces.extend([ sizes[sizes != 0] for sizes in map(packetSizes, lines) ])
+	return np.array(labels, np.int64), traces
+
+def generate(pagespath, outputpath, dataSet, form='TCP', instances=None, featureCount=100, cache=True):
+	# Writes {dataSet}_{form} and its parsed arrays, returns the feature file
+	labels, traces = readTraces(pagespath, instances)
+	features = cumulativeFeatures(traces, featureCount)
+	if not os.path.isdir(outputpath):
+		os.makedirs(outputpath)
+	feature_file = os.path.join(outputpath, dataSet + '_' + form)
+	featureCache = FeatureCache(defaultPath(outputpath) if cache else None)
+	featureCache.writeAtomic(feature_file, formatLines(labels, features))
+	if cache:
+		# formatLines writes floats with repr, parsing gives back the same values
+		featureCache.storeParsed(feature_file, labels.astype(np.float64), features)
+	return feature_file
+
+def compareFile(pagespath, feature_file, instances=None, featureCount=100):
+	# Differences between the native features of a page directory and generate-feature.py's file
+	if not os.path.isfile(feature_file):
+		return [ feature_file + ' not found' ]
+	labels, traces = readTraces(pagespath, instances)
+	features = cumulativeFeatures(traces, featureCount)
+	fin = open(feature_file, 'r')
+	text = fin.read()
+	fin.close()
+	scriptLabels, scriptFeatures = parseInstances(text)
+	if scriptFeatures.shape != features.shape:
+		return [ 'shape {0} instead of {1}'.format(features.shape, scriptFeatures.shape) ]
+	mismatches = []
+	if (scriptLabels != labels).any():
+		mismatches.append('{0} labels differ'.format((scriptLabels != labels).sum()))
+	differ = (scriptFeatures != features).any(axis=1)
+	if differ.any():
+		mismatches.append('{0} instances differ (first: line {1}, largest difference {2!r})'.format(
+		                  differ.sum(), np.flatnonzero(differ)[0] + 1, float(np.abs(scriptFeatures - features).max())))
+	lines = formatLines(labels, features).splitlines()
+	textDiffer = [ i for i, (line, scriptLine) in enumerate(zip(lines, text.splitlines())) if line != scriptLine.rstrip() ]
+	if textDiffer:
+		mismatches.append('{0} lines are written differently (first: line {1})'.format(len(textDiffer), textDiffer[0] + 1))
+	return mismatches
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+# Compact in-memory dataset used by easy_WSC.py
+#   labels: int32 labels of the merged input (-1 main page, page label within the website, 0 background)
+#   features: float32 matrix (instances x features), scaled and rounded to the precision of svm-scale's output
+# Pages and background are referenced by index arrays, so shuffling, limiting and
+# splitting into folds never copy instances.
+
+import numpy as np
+from wsc_scale import roundPrecision
+
+# Rows that are formatted at once
+chunkSize = 4096
+
+class Dataset(object):
+
+	def __init__(self, labels, features):
+		self.labels = labels
+		self.features = features
+		self._columns = None
+
+	@classmethod
+	def fromBlocks(cls, blocks, scaler=None):
+		# blocks of parsed (labels, features) in merged order, scaled if a scaler is given
+		# Parsed blocks are released from the list as soon as they are copied
+		count = sum([ len(labels) for labels, _ in blocks ])
+		if scaler is not None:
+			width = len(scaler.feature_min)
+		else:
+			width = max([ features.shape[1] for _, features in blocks ] + [ 0 ])
+		labels = np.empty(count, np.int32)
+		features = np.zeros((count, width), np.float32)
+		start = 0
+		for i in range(len(blocks)):
+			blockLabels, blockFeatures = blocks[i]
+			blocks[i] = None
+			# Shared (cached or memory-mapped) blocks stay untouched
+			if not blockFeatures.flags.writeable:
+				blockFeatures = np.array(blockFeatures)
+			if scaler is not None:
+				blockFeatures = scaler.transform(blockFeatures)
+			roundPrecision(blockFeatures)
+			end = start + len(blockLabels)
+			labels[start:end] = blockLabels
+			features[start:end, :blockFeatures.shape[1]] = blockFeatures
+			start = end
+		return cls(labels, features)
+
+	def __len__(self):
+		return len(self.labels)
+
+	def segments(self):
+		# Runs of equal labels in merged order: (label, start, end)
+		if len(self.labels) == 0:
+			return []
+		starts = np.flatnonzero(np.r_[True, self.labels[1:] != self.labels[:-1]])
+		ends = np.r_[starts[1:], len(self.labels)]
+		return [ (int(self.labels[start]), int(start), int(end)) for start, end in zip(starts, ends) ]
+
+	def columns(self):
+		# Features that are set for any instance (svm-scale drops constant features)
+		if self._columns is None:
+			used = np.zeros(self.features.shape[1], bool)
+			for start in range(0, len(self.features), 65536):
+				used |= (self.features[start:start+65536] != 0).any(axis=0)
+			self._columns = np.flatnonzero(used)
+		return self._columns
+
+	def formatLines(self, label, indices):
+		# libSVM text lines of the given instances, labeled with label
+		columns = self.columns()
+		prefix = str(label) + ' '
+		dense = ''.join([ '%d:%%g ' % (column+1) for column in columns ]) + '\n'
+		lines = []
+		for start in range(0, len(indices), chunkSize):
+			rows = self.features[indices[start:start+chunkSize]][:, columns].tolist()
+			for row in rows:
+				if 0.0 in row:
+					lines.append(prefix + ''.join([ '%d:%g ' % (column+1, value) for column, value in zip(columns, row) if value != 0 ]) + '\n')
+				else:
+					lines.append(prefix + dense % tuple(row))
+		return ''.join(lines)
+
+	def writeLines(self, fout, label, indices):
+		for start in range(0, len(indices), chunkSize):
+			fout.write(self.formatLines(label, indices[start:start+chunkSize]))
+
+	def select(self, parts):
+		# Labels and features of [(label, indices), ...] in the given order
+		if not parts:
+			return np.zeros(0, np.int32), np.zeros((0, self.features.shape[1]), np.float32)
+		labels = np.concatenate([ np.full(len(indices), label, np.int32) for label, indices in parts ])
+		indices = np.concatenate([ np.asarray(indices, np.intp) for _, indices in parts ])
+		return labels, self.features[indices]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+# Offline domain resolution for the open-world background filter
+#   domains are extracted with the public suffix list bundled with tldextract (no download),
+#   recently resolved hosts are remembered (at most hostCacheSize), links of the same host share
+#   the result and a streamed background does not grow the memory of its hosts without bound
+#   the filter returns index arrays of kept and skipped background instances, which can be
+#   cached next to the parsed background (see wsc_cache.py)
+
+import sys, re, functools
+import numpy as np
+
+# Hosts whose domain is remembered, the least recently used are resolved again
+hostCacheSize = 1 << 16
+
+# Same scheme handling as tldextract, the rest up to the path is the host (with port/user)
+schemePattern = re.compile(r'^([a-z0-9.+-]+:)?//', re.IGNORECASE)
+
+def hostOf(link):
+	link = schemePattern.sub('', link.strip(), 1)
+	for separator in '/?#':
+		link = link.split(separator, 1)[0]
+	return link
+
+class DomainResolver(object):
+
+	def __init__(self):
+		# tldextract is only imported for an open-world background
+		try:
+			import tldextract
+		except ImportError:
+			print('You need tldextract! (pip install tldextract)')
+			sys.exit()
+		# Offline: no suffix list URLs, tldextract falls back to its bundled snapshot
+		self.extractor = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+		self.hostDomain = functools.lru_cache(maxsize=hostCacheSize)(self.extractDomain)
+
+	def extractDomain(self, host):
+		return self.extractor(host).domain
+
+	def domain(self, link):
+		return self.hostDomain(hostOf(link))
+
+	def resolve(self, links):
+		return [ self.domain(link) for link in links ]
+
+def readLinks(domain_file):
+	flinks = open(domain_file, 'r')
+	links = [ line.rstrip('\n') for line in flinks ]
+	flinks.close()
+	return links
+
+def filterDomains(domains, foreground):
+	# (kept, skipped) indices of the background, skipped domains belong to a foreground site
+	foreground = set(foreground)
+	skipped = np.array([ domain in foreground for domain in domains ], dtype=bool)
+	return np.flatnonzero(~skipped), np.flatnonzero(skipped)
@@ -0,0 +1,1352 @@
+#!/usr/bin/env python
+
+# k-fold evaluation of WSC as a library, easy_WSC.py is its command line
+#   many evaluations can run in one long-lived process: the backend, the feature cache, the store
+#   of CV rates and the resolved background domains are created once per Evaluator, natsort &
+#   tldextract are only imported when they are used
+#
+#   options = Options().parse([ '-in', '/Path/wsc_features/', ... ])  (or set the attributes)
+#   evaluator = Evaluator(options)
+#   evaluator.evaluate()                        : everything easy_WSC.py does
+# or stage by stage:
+#   fmt = evaluator.selectFormat('Cell')        : input files of a format (FormatInput)
+#   loaded = evaluator.load(fmt, 0)             : merged, scaled, grouped & shuffled pages (LoadedSite)
+#   plan = evaluator.plan(loaded, ((-1, -1, -1), -1))
+#                                               : limits & folds of a configuration (FoldPlan)
+#   evaluator.quickSearch(plan, workers)        : one CV for all folds (-quickCV YES)
+#   evaluator.writeFolds(plan)                  : .train/.test files (backends with usesFiles)
+#   fold = evaluator.fold(plan, 1)              : training & testing data of a fold (Fold)
+#   evaluator.search(plan, fold, workers)       : CV of the fold (-quickCV NO)
+#   model = evaluator.train(plan, fold); evaluator.predict(plan, fold, model)
+#   metrics = evaluator.score(plan)             : .result & .metrics of the merged folds (Metrics)
+# A LoadedSite is not changed by plan(), every configuration of a sweep starts from it. Its timer holds
+# the loading, each plan records its stages on a branch of it (.timings of the configuration).
+# Errors raise WSCError and invalid options OptionError, their message is the "Error: ..." line
+# easy_WSC.py prints. Shuffles draw from their own random.Random, the global random is not changed.
+
+from __future__ import division # for division
+from subprocess import *
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+import sys, os, io, random, glob, multiprocessing
+from wsc_backend import backends, searches, kernelMaps, subprocessTools, SubprocessBackend, InprocessBackend, ApproximateBackend, SearchHistory, readGridStatus
+try:
+	import numpy as np
+except ImportError:
+	print('You need numpy! (pip install numpy)')
+	sys.exit()
+from wsc_scale import Scaler, parseInstances, blockRange
+from wsc_dataset import Dataset
+from wsc_cache import FeatureCache, defaultPath
+from wsc_searchstore import SearchStore
+from wsc_domains import DomainResolver, readLinks, filterDomains
+from wsc_metrics import Metrics, loadPredictions, siteLabels, writeResult
+from wsc_timing import Timer
+from wsc_stream import BackgroundStream, FoldAssigner
+import wsc_hierarchy
+
+# Define formats
+formats = [ 'TCP', 'TLS', 'TLSLegacy', 'TLSNoSendme', 'Cell', 'CellNoSendme' ]
+
+# Arguments to be read from WFP_conf: (attribute, environment variable, option)
+environment = [ ('inputpath', 'dir_EVAL_INPUT', 'in'),
+                ('outputpath', 'dir_EVAL_OUTPUT', 'out'),
+                ('svmpath', 'dir_EVAL_LIBSVM', 'svm') ]
+
+# Options with a value: option -> attribute, converted by Options.parse()
+stringOptions = { 'in': 'inputpath', 'out': 'outputpath', 'name': 'outputname', 'storage': 'storage',
+                  'setting': 'setting', 'background': 'bg_name', 'svm': 'svmpath', 'backend': 'backend_name',
+                  'scale': 'scaling', 'kernelMap': 'kernel', 'search': 'search', 'gnuplot': 'gnuplot_exe',
+                  'log2c': 'log2c', 'log2g': 'log2g' }
+switchOptions = { 'mainpages': ('main', 'Main Page'), 'quickCV': ('quick', 'Quick CV'),
+                  'randomInstances': ('shuffleInstances', 'Random'), 'randomSubpages': ('shuffleSubpages', 'Random'),
+                  'simple': ('simple', 'Simple'), 'hierarchical': ('hierarchical', 'Hierarchical'),
+                  'separateEvaluation': ('separateEval', 'Separate Evaluation'), 'stream': ('stream', 'Stream'),
+                  'timings': ('timings', 'Timings'), 'shareSearch': ('shareSearch', 'Share Search'),
+                  'cache': ('useCache', 'Cache'), 'compareExact': ('compareExact', 'Compare Exact') }
+numberOptions = { 'seed': ('seed', 'Seed'), 'bootstrap': ('bootstrap', 'Number of Bootstrap Resamples'),
+                  'components': ('components', 'Number of Components'), 'v': ('folds', 'Number of Folds'),
+                  'worker': ('nr_worker', 'Number of Workers') }
+listOptions = [ 'format', 'limitWebsites', 'limitInstances', 'limitSubpages' ]
+
+# Processes of the evaluation inherit the evaluator and the loaded data instead of pickling them,
+# this needs the fork start method whatever the platform's default is
+forkContext = multiprocessing.get_context('fork')
+
+def natsorted(items):
+	# natsort is imported on first use
+	try:
+		from natsort import natsorted as sort
+	except ImportError:
+		print('You need natsort! (pip install natsort)')
+		sys.exit()
+	return sort(items)
+
+def timestamp():
+	return '[' + str(datetime.now()).split('.')[0] + '] '
+
+class OptionError(Exception):
+	# message is the "Error: ..." line of exit_with_help
+	pass
+
+class WSCError(Exception):
+	# message is the "Error: ..." line of a failed evaluation
+	pass
+
+class Options(object):
+
+	def __init__(self):
+		# Paths default to the environment (inputpath gets wsc_features/ appended), None if unset
+		self.inputpath = os.getenv('dir_EVAL_INPUT')
+		if self.inputpath is not None:
+			self.inputpath = self.inputpath + 'wsc_features/'
+		self.outputpath = os.getenv('dir_EVAL_OUTPUT')
+		self.svmpath = os.getenv('dir_EVAL_LIBSVM')
+		self.outputname = 'WSC_Eval'
+		self.storage = 'Low'
+		self.quiet = False
+		self.forms = [ 'TCP' ]
+		# None: random with several formats, else unseeded
+		self.seed = None
+		self.main = True
+		self.quick = True
+		self.shuffleInstances = False
+		self.shuffleSubpages = False
+		self.setting = 'CW'
+		self.simple = True
+		self.hierarchical = False
+		self.bg_name = ''
+		self.separateEval = False
+		# indices of the separately evaluated websites, None for all
+		self.websitesIndex = None
+		# (#subpages, #mainpages, #background) and #subpages per site, -1 for default, lists are swept
+		self.instanceLimits = [ (-1, -1, -1) ]
+		self.subpageLimits = [ -1 ]
+		self.backend_name = 'subprocess'
+		self.kernel = 'fourier'
+		self.components = 1000
+		# None: YES for the approximate backend
+		self.compareExact = None
+		self.scaling = 'native'
+		self.stream = False
+		# wsc_cache/ is not bounded, it is only used on request
+		self.useCache = False
+		self.search = 'grid'
+		self.shareSearch = True
+		self.gnuplot_exe = None
+		# None: grid.py's defaults (-5,15,2 & 3,-15,-2)
+		self.log2c = None
+		self.log2g = None
+		# None: 10 folds, 5 for the CV of the in-memory backends
+		self.folds = None
+		# None: #Threads
+		self.nr_worker = None
+		self.timings = False
+		self.bootstrap = 1000
+
+	def parse(self, arguments):
+		# Command line arguments of easy_WSC.py
+		i = 0
+		while i < len(arguments):
+			option = arguments[i][1:]
+			if arguments[i] == '-q':
+				self.quiet = True
+				i = i + 1
+				continue
+			if not arguments[i].startswith('-') or i + 1 == len(arguments) or not (option in stringOptions or option in switchOptions or option in numberOptions or option in listOptions):
+				raise OptionError('Error: Unknown Argument! (' + arguments[i] + ')')
+			value = arguments[i+1]
+			if option in stringOptions:
+				setattr(self, stringOptions[option], value)
+			elif option in switchOptions:
+				attribute, name = switchOptions[option]
+				if value not in [ 'YES', 'NO' ]:
+					raise OptionError('Error: Unknown ' + name + ' Option!')
+				setattr(self, attribute, value == 'YES')
+			elif option in numberOptions:
+				attribute, name = numberOptions[option]
+				if not value.isdigit():
+					raise OptionError('Error: ' + name + ' is not a Number!')
+				setattr(self, attribute, int(value))
+			elif option == 'format':
+				self.forms = value.split(',')
+			elif option == 'limitWebsites':
+				try:
+					self.websitesIndex = list(map(int, value.split(',')))
+				except ValueError:
+					raise OptionError('Error: Invalid Websites!')
+			else:
+				self.parseLimits(option, value)
+			i = i + 2
+		return self
+
+	def parseLimits(self, option, value):
+		# Lists of limits (separated by ":") sweep over every combination
+		try:
+			if option == 'limitInstances':
+				self.instanceLimits = [ tuple(map(int, limits.split(','))) for limits in value.split(':') ]
+				if not all([ len(limits) == 3 for limits in self.instanceLimits ]):
+					raise ValueError
+			else:
+				self.subpageLimits = list(map(int, value.split(':')))
+		except ValueError:
+			raise OptionError('Error: Invalid Limits!')
+
+	def configurations(self):
+		# ((#subpages, #mainpages, #background), #subpages per site) of every evaluation
+		return [ (limits, subpageLimit) for limits in self.instanceLimits for subpageLimit in self.subpageLimits ]
+
+	def gridOption(self):
+		# grid.py options of the subprocess backend, only the given ones
+		option = ''
+		if self.log2c is not None:
+			option += ' -log2c ' + self.log2c
+		if self.log2g is not None:
+			option += ' -log2g ' + self.log2g
+		if self.folds is not None:
+			option += ' -v ' + str(self.folds)
+		return option
+
+	def check(self):
+		# Raises OptionError for invalid or missing options
+		for attribute, env, arg in environment:
+			if getattr(self, attribute) is None:
+				raise OptionError('Error: Environmental Variables or Argument insufficiently set! ($' + env + ' / "-' + arg + '")')
+		if not os.path.isdir(self.inputpath):
+			raise OptionError('Error: Invalid Input Path!')
+		if self.storage not in [ 'Low', 'RemoveTemp', 'High' ]:
+			raise OptionError('Error: Unknown Storage Option!')
+		if not all([ form in formats for form in self.forms ]) or len(set(self.forms)) != len(self.forms) or not self.forms:
+			raise OptionError('Error: Unknown Format!')
+		if self.main and not all([ os.path.isfile(self.inputpath+'mainPages_'+form) for form in self.forms ]):
+			raise OptionError('Error: Invalid Main Pages Files!')
+		if self.setting not in [ 'CW', 'OW' ]:
+			raise OptionError('Error: Unknown Setting!')
+		if self.hierarchical and self.simple:
+			raise OptionError('Error: Hierarchical Classification needs -simple NO!')
+		if self.setting == 'OW':
+			if self.bg_name == '':
+				raise OptionError('Error: No Background File Set!')
+			if not all([ os.path.isfile(self.inputpath+self.bg_name+'_'+form) for form in self.forms ]):
+				raise OptionError('Error: Invalid Background File!')
+			if not all([ os.path.isfile(self.inputpath+self.domainFile(form)) for form in self.forms ]):
+				raise OptionError('Error: Invalid Domain-Background File!')
+		elif self.bg_name != '':
+			raise OptionError('Error: Background File Set in Closed-world Scenario!')
+		if self.separateEval and self.setting != 'OW':
+			raise OptionError('Error: Separate Evaluation is only meaningful in Open-world Scenario!')
+		if not os.path.isdir(self.svmpath):
+			raise OptionError('Error: Invalid LibSVM Path!')
+		if self.gnuplot_exe is not None and not os.path.exists(self.gnuplot_exe):
+			raise OptionError('Error: gnuplot executable not found!')
+		if self.scaling == 'svm-scale' and not os.path.exists(os.path.join(self.svmpath, 'svm-scale')):
+			raise OptionError('Error: svm-scale executable not found!')
+		if self.scaling not in [ 'native', 'svm-scale' ]:
+			raise OptionError('Error: Unknown Scaling Option!')
+		if self.stream and self.setting != 'OW':
+			raise OptionError('Error: Streaming is only meaningful in Open-world Scenario!')
+		if self.stream and (self.scaling != 'native' or self.backend_name != 'subprocess'):
+			raise OptionError('Error: Streaming needs native Scaling and the subprocess Backend!')
+		if self.backend_name not in backends:
+			raise OptionError('Error: Unknown Backend!')
+		if self.backend_name == 'subprocess':
+			for name, filename in subprocessTools(self.svmpath):
+				if not os.path.exists(filename):
+					raise OptionError('Error: ' + name + ' not found!')
+		if self.search not in searches:
+			raise OptionError('Error: Unknown Search!')
+		if self.search != 'grid' and self.backend_name == 'subprocess':
+			raise OptionError('Error: Halving Search needs the inprocess or approximate Backend!')
+		if self.kernel not in kernelMaps:
+			raise OptionError('Error: Unknown Kernel Map!')
+		if self.components <= 0:
+			raise OptionError('Error: Number of Components is not a valid Number!')
+		if self.folds is not None and self.folds <= 0:
+			raise OptionError('Error: Number of Folds is not a valid Number!')
+		if self.nr_worker is not None and self.nr_worker <= 0:
+			raise OptionError('Error: Number of Workers is not a valid Number!')
+		return self
+
+	def domainFile(self, form):
+		# Domains of the background instances, one link per line
+		return 'list_' + self.bg_name[0].lower() + self.bg_name[1:] + '_' + form + '.txt'
+
+class FormatInput(object):
+	# Input files of an evaluated format, the background's links & domain filters are kept per format
+
+	def __init__(self, options, form, resolver=None):
+		self.form = form
+		# scenario of the format, the names of the sites and limits are appended
+		self.scenario = ('_simple' if options.simple else '') + '_' + form
+		self.sitefiles = natsorted(glob.glob(options.inputpath+'wsc*_'+form))
+		self.sites = 1 if options.separateEval else len(self.sitefiles)
+		self.mainPages = options.inputpath+'mainPages_'+form
+		self.bg_file = None
+		self.bg_domain_file = None
+		if options.setting == 'OW':
+			self.bg_file = options.inputpath+options.bg_name+'_'+form
+			self.bg_domain_file = options.inputpath+options.domainFile(form)
+		self.domainLinks = None
+		self.domainFilters = {}
+		# A streamed background is read in chunks together with its domain list
+		self.backgroundStream = None
+		if options.stream:
+			self.backgroundStream = BackgroundStream(self.bg_file, self.bg_domain_file, resolver)
+
+	def siteName(self, currentSite):
+		# Name of a website file (wsc{Name}_{Format})
+		return os.path.basename(self.sitefiles[currentSite]).replace('wsc','').split('_')[0]
+
+class LoadedSite(object):
+	# Merged, scaled and grouped pages of an evaluation (all sites, or one with -separateEvaluation):
+	# classes maps page k (1..sites*subpages) to instance indices into dataset, background holds the
+	# background's indices (in memory) or backgroundCount is the size of the filtered streamed background
+	pass
+
+class FoldPlan(object):
+	# Limited pages and background of a configuration, partitioned into folds:
+	# fold i tests pages currentFold..currentFold+pagesPerFold-1 of every site and background part i
+	pass
+
+class Fold(object):
+	# Training & testing data of a fold (files or (labels, features)) and its cache keys
+
+	def __init__(self, plan, currentFold):
+		self.number = currentFold
+		# outputname + scenario + '_' + fold, the files of the fold append their extension
+		self.prefix = plan.prefix + '_' + str(currentFold)
+		# progress & accuracy of the fold, evaluation() gives parallel folds a buffer each
+		self.output = sys.stdout
+
+# Evaluator and site of the pool of -separateEvaluation, inherited by its forked processes
+separateSites = None
+
+def evaluateSeparateSite(currentSite):
+	# Errors are returned to the main process, None if the site was evaluated
+	evaluator, fmt, workers = separateSites
+	try:
+		evaluator.evaluateSite(fmt, currentSite, workers)
+	except WSCError as error:
+		return str(error)
+	return None
+
+class Evaluator(object):
+
+	def __init__(self, options):
+		self.options = options.check()
+		if not os.path.isdir(options.outputpath):
+			os.mkdir(options.outputpath)
+		self.openworld = options.setting == 'OW'
+		self.folds = options.folds if options.folds is not None else 10
+		self.nr_worker = options.nr_worker if options.nr_worker is not None else multiprocessing.cpu_count()
+		self.compareExact = options.backend_name == 'approximate' and options.compareExact != False
+		# Formats are only comparable with the same shuffles
+		self.seed = options.seed
+		if self.seed is None and len(options.forms) > 1:
+			self.seed = random.getrandbits(32)
+		self.svmscale_exe = os.path.join(options.svmpath, 'svm-scale')
+		gnuplot_exe = options.gnuplot_exe
+		if gnuplot_exe is None and os.path.exists('/usr/bin/gnuplot'):
+			gnuplot_exe = '/usr/bin/gnuplot'
+		log2c = options.log2c if options.log2c is not None else '-5,15,2'
+		log2g = options.log2g if options.log2g is not None else '3,-15,-2'
+		# grid.py uses 5 folds unless -v is given
+		cvFolds = options.folds if options.folds is not None else 5
+		if options.backend_name == 'inprocess':
+			self.backend = InprocessBackend(options.svmpath, log2c, log2g, cvFolds, options.quiet, options.search)
+		elif options.backend_name == 'approximate':
+			self.backend = ApproximateBackend(log2c, log2g, cvFolds, options.quiet, options.search, options.kernel, options.components)
+		else:
+			self.backend = SubprocessBackend(options.svmpath, gnuplot_exe, options.gridOption(), log2c, log2g, options.quiet)
+		# Exact RBF models with the approximate backend's parameters, only trained for the comparison
+		self.exactBackend = None
+		if self.compareExact:
+			self.exactBackend = InprocessBackend(options.svmpath, log2c, log2g, cvFolds, True)
+
+		# Parsed source files are shared by all evaluations of this evaluator (and later ones with -cache YES)
+		self.featureCache = FeatureCache(defaultPath(options.inputpath) if options.useCache else None)
+		# Searches, models and predictions also depend on the backend's tools and settings
+		self.backendIdentity = None
+		self.exactIdentity = None
+		# CV rates of grid points are shared by every search on the same training data
+		self.searchStore = None
+		self.rateIdentity = None
+		if options.useCache:
+			self.backendIdentity = self.identity(*self.backend.identity())
+			if self.compareExact:
+				self.exactIdentity = self.identity(*self.exactBackend.identity())
+			self.searchStore = SearchStore(os.path.join(defaultPath(options.inputpath), 'search.sqlite'))
+			self.rateIdentity = self.featureCache.key('rates', self.identity(*self.backend.rateIdentity()))
+		# Background domains are resolved once per host
+		self.domainResolver = None
+
+	def identity(self, files, settings):
+		return [ self.featureCache.fingerprint(filename) for filename in files ] + settings
+
+	def resolver(self):
+		if self.domainResolver is None:
+			self.domainResolver = DomainResolver()
+		return self.domainResolver
+
+	def selectFormat(self, form):
+		return FormatInput(self.options, form, self.resolver() if self.options.stream else None)
+
+	def evaluate(self):
+		# Every format, site and configuration of the options
+		forms = self.options.forms
+		if len(forms) == 1:
+			self.evaluateFormat(forms[0], self.nr_worker)
+			return
+		# Formats are independent: forked processes evaluate them with a share of the workers
+		parallelFormats = max(1, min(len(forms), self.nr_worker))
+		format_workers = max(1, self.nr_worker // parallelFormats)
+		failed = []
+		for start in range(0, len(forms), parallelFormats):
+			processes = [ (form, forkContext.Process(target=self.evaluateFormatProcess, args=(form, format_workers))) for form in forms[start:start+parallelFormats] ]
+			for _, process in processes:
+				process.start()
+			for form, process in processes:
+				process.join()
+				if process.exitcode != 0:
+					failed.append(form)
+		if failed:
+			raise WSCError('Error: Evaluation of ' + ', '.join(failed) + ' failed!')
+
+	def evaluateFormatProcess(self, form, workers):
+		# The process prints its error, the exit code reports it to the main process
+		try:
+			self.evaluateFormat(form, workers)
+		except WSCError as error:
+			print(error)
+			sys.exit(1)
+
+	def evaluateFormat(self, form, workers):
+		global separateSites
+		options = self.options
+		fmt = self.selectFormat(form)
+		if not options.separateEval:
+			self.evaluateSite(fmt, 0, workers)
+			return
+		selectedSites = [ currentSite for currentSite in range(0,len(fmt.sitefiles)) if options.websitesIndex is None or currentSite in options.websitesIndex ]
+		parallelSites = max(1, min(len(selectedSites), workers))
+		site_workers = max(1, workers // parallelSites)
+		if parallelSites == 1:
+			for currentSite in selectedSites:
+				self.evaluateSite(fmt, currentSite, site_workers)
+			return
+		# Sites are independent: forked processes share the parsed background read-only
+		if options.scaling == 'native':
+			if options.main:
+				self.featureCache.loadParsed(fmt.mainPages)
+			if not options.stream:
+				self.featureCache.loadRange(fmt.bg_file)
+		if not options.stream:
+			for currentSite in selectedSites:
+				self.backgroundFilter(fmt, [ fmt.siteName(currentSite).lower() ])
+		separateSites = (self, fmt, site_workers)
+		pool = forkContext.Pool(parallelSites, random.seed)
+		try:
+			errors = [ error for error in pool.map(evaluateSeparateSite, selectedSites, 1) if error is not None ]
+		finally:
+			pool.close()
+			pool.join()
+			separateSites = None
+		if errors:
+			raise WSCError('\n'.join(errors))
+
+	def evaluateSite(self, fmt, currentSite, workers):
+		# Complete evaluation of all sites, or of a single site with -separateEvaluation
+		loaded = self.load(fmt, currentSite)
+		# every configuration limits the same shuffled pages & instances
+		configurations = self.options.configurations()
+		if len(configurations) == 1:
+			self.evaluatePlan(self.plan(loaded, configurations[0]), workers)
+		else:
+			self.sweepConfigurations(loaded, workers)
+
+	def mergeSources(self, fmt, currentSite):
+		# Files of the merged input in order: (filename, site) selects the main page of a site, (filename, None) a whole file
+		options = self.options
+		sources = []
+		site = 1
+		# Read foreground / closed-world dataset
+		for filename in fmt.sitefiles:
+			if options.separateEval:
+				# we do not want to process this page at the moment
+				if filename != fmt.sitefiles[currentSite]:
+					continue
+				compare = currentSite + 1
+			else:
+				compare = site
+			# Add Main Page
+			if options.main:
+				sources.append((fmt.mainPages, compare))
+			# Add Subpages of website
+			sources.append((filename, None))
+			site += 1
+
+		# Read in background dataset, a streamed background is read in chunks instead
+		if self.openworld and not options.stream:
+			sources.append((fmt.bg_file, None))
+		return sources
+
+	def mergeInput(self, fmt, currentSite):
+		# Text of the merged input, main pages are labeled -1
+		for filename, compare in self.mergeSources(fmt, currentSite):
+			fin = open(filename, 'r')
+			if compare is None:
+				# Whole files are copied in blocks
+				while True:
+					text = fin.read(1 << 24)
+					if not text: break
+					yield text
+			else:
+				yield ''.join([ '-1 ' + line.split(' ', 1)[-1] for line in fin if int(line.split()[0]) == compare ])
+			fin.close()
+
+	def mergeBlocks(self, fmt, currentSite):
+		# Parsed (labels, features) of the merged input, main pages are labeled -1
+		for filename, compare in self.mergeSources(fmt, currentSite):
+			labels, features = self.featureCache.loadParsed(filename)
+			if compare is None:
+				yield labels, features
+			else:
+				selected = labels == compare
+				yield np.full(np.count_nonzero(selected), -1.0), features[selected]
+
+	def backgroundLinks(self, fmt):
+		if fmt.domainLinks is None:
+			fmt.domainLinks = readLinks(fmt.bg_domain_file)
+		return fmt.domainLinks
+
+	def backgroundFilter(self, fmt, foreground):
+		# (kept, skipped) indices into the background, cached next to the parsed background
+		name = tuple(sorted(set(foreground)))
+		if name in fmt.domainFilters:
+			return fmt.domainFilters[name]
+		cached = None
+		if self.options.useCache:
+			key = self.featureCache.key('domains', self.featureCache.fingerprint(fmt.bg_domain_file), name)
+			cached = self.featureCache.loadIndices(key)
+		if cached is None:
+			cached = filterDomains(self.resolver().resolve(self.backgroundLinks(fmt)), name)
+			if self.options.useCache:
+				self.featureCache.storeIndices(key, *cached)
+		fmt.domainFilters[name] = cached
+		return cached
+
+	def scanBackground(self, fmt, foreground):
+		# (range, instances, kept instances, links, skipped (domain, link)) of the streamed background,
+		# cached for the background, its domain list and the foreground
+		featureCache = self.featureCache
+		name = sorted(set(foreground))
+		if self.options.useCache:
+			key = featureCache.key('stream', featureCache.fingerprint(fmt.bg_file), featureCache.fingerprint(fmt.bg_domain_file), name)
+			cached = featureCache.loadResult('stream', key)
+			if cached is not None:
+				count, fmin, fmax = cached['range']
+				return (count, np.array(fmin), np.array(fmax)), cached['instances'], cached['kept'], cached['links'], cached['skipped']
+		skipped = []
+		backgroundRange, instances, kept, links = fmt.backgroundStream.scan(name, lambda domain, link: skipped.append((domain, link)))
+		if self.options.useCache:
+			featureCache.storeResult('stream', key, { 'range': [ backgroundRange[0], backgroundRange[1].tolist(), backgroundRange[2].tolist() ],
+			                                          'instances': instances, 'kept': kept, 'links': links, 'skipped': skipped })
+		return backgroundRange, instances, kept, links, skipped
+
+	def foldAssigner(self, plan):
+		# Every pass over the streamed background of an evaluation draws the same parts
+		return FoldAssigner(self.folds, plan.pagesPerBGFold, plan.loaded.backgroundCount, self.options.shuffleInstances, plan.loaded.streamSeed)
+
+	def load(self, fmt, currentSite):
+		# Merge, scale, group & shuffle the pages of an evaluation (currentSite with -separateEvaluation)
+		options = self.options; featureCache = self.featureCache
+		loaded = LoadedSite()
+		loaded.fmt = fmt
+		loaded.sites = fmt.sites
+		loaded.timer = timer = Timer()
+		self.backend.timer = timer
+		# every format (and separately evaluated site) shuffles the same way
+		rng = random.Random('{0}:{1}'.format(self.seed, currentSite) if self.seed is not None else None)
+
+		# Determine Filenames
+		loaded.scenario = fmt.scenario
+		if options.separateEval:
+			loaded.name = fmt.siteName(currentSite)
+			loaded.outputname = options.outputname + '_' + loaded.name
+			loaded.foreground = [ loaded.name.lower() ]
+		else:
+			loaded.name = None
+			loaded.outputname = options.outputname
+			loaded.foreground = [ fmt.siteName(site).lower() for site in range(len(fmt.sitefiles)) ]
+
+		if not options.quiet:
+			print(timestamp() + 'Processing ' + loaded.outputname + loaded.scenario)
+		merged_file = os.path.join(options.outputpath, loaded.outputname + loaded.scenario + '.merged')
+		range_file = os.path.join(options.outputpath, loaded.outputname + loaded.scenario + '.range')
+		merged_scaled_file = os.path.join(options.outputpath, loaded.outputname + loaded.scenario + '.merged.scale')
+
+		loaded.scaler = None
+		loaded.backgroundCount = 0
+		if options.scaling == 'native':
+			# Scale parsed arrays and obtain range file
+			if not options.quiet:
+				print(timestamp() + 'Scaling data...')
+			streamed = []
+			if options.stream:
+				# One pass over the background: its range and the instances kept by the domain filter
+				stage = timer.start('scan')
+				backgroundRange, backgroundInstances, loaded.backgroundCount, links, skipped = self.scanBackground(fmt, loaded.foreground)
+				timer.stop(stage)
+				if links < backgroundInstances:
+					raise WSCError('Error: Domain-Background File has fewer Links than the Background!')
+				if not options.quiet:
+					for domain, link in skipped:
+						print('\tSkipped: ' + domain + '//' + link)
+				streamed = [ (featureCache.fingerprint(fmt.bg_file), 'stream') ]
+			cached = None
+			if options.useCache:
+				stage = timer.start('load')
+				key = featureCache.key('native', [ (featureCache.fingerprint(filename), compare) for filename, compare in self.mergeSources(fmt, currentSite) ] + streamed)
+				cached = featureCache.loadDataset(key, range_file)
+				timer.stop(stage)
+			if cached is not None:
+				dataset = Dataset(*cached)
+				# the streamed background is scaled chunk by chunk with the stored range
+				if options.stream:
+					loaded.scaler = Scaler().load(range_file)
+			else:
+				stage = timer.start('merge')
+				blocks = list(self.mergeBlocks(fmt, currentSite))
+				timer.stop(stage)
+				stage = timer.start('scale')
+				# Ranges of whole files (background) are shared by all evaluations
+				loaded.scaler = Scaler().fitRanges([ blockRange(features) if compare is not None else featureCache.loadRange(filename) for (filename, compare), (_, features) in zip(self.mergeSources(fmt, currentSite), blocks) ] + ([ backgroundRange ] if options.stream else []))
+				loaded.scaler.save(range_file)
+				dataset = Dataset.fromBlocks(blocks, loaded.scaler)
+				timer.stop(stage)
+				if options.useCache:
+					stage = timer.start('load')
+					featureCache.storeDataset(key, dataset.labels, dataset.features, range_file)
+					timer.stop(stage)
+		else:
+			# Merge input files
+			stage = timer.start('merge')
+			fout = open(merged_file, 'w')
+			for text in self.mergeInput(fmt, currentSite):
+				fout.write(text)
+			fout.close()
+			timer.stop(stage)
+
+			# Scale data and obtain range file
+			stage = timer.start('scale')
+			cmd = '{0} -s "{1}" "{2}" > "{3}"'.format(self.svmscale_exe, range_file, merged_file, merged_scaled_file)
+			if not options.quiet:
+				print(timestamp() + 'Scaling data...')
+				timer.run(cmd)
+			else:
+				timer.run(cmd, stdout = PIPE)
+			timer.stop(stage)
+			stage = timer.start('load')
+			fscaled = open(merged_scaled_file, 'r')
+			dataset = Dataset.fromBlocks([ parseInstances(fscaled.read()) ])
+			fscaled.close()
+			timer.stop(stage)
+		loaded.dataset = dataset
+
+		# Group instances into index arrays per class
+		stage = timer.start('load')
+		classes = {}
+		background = []
+		className = 0
+		lastClass = 0
+
+		for currentClass, start, end in dataset.segments():
+			if currentClass != lastClass:
+				className += 1
+				lastClass = currentClass
+
+			# handle background separately
+			if currentClass == 0:
+				if self.openworld:
+					background.append(np.arange(start, end))
+					continue
+				else:
+					raise WSCError('Error: The instance number seems to be incorrect!')
+
+			# all gathered instances of the class
+			classes[className] = np.arange(start, end)
+		background = np.concatenate(background) if background else np.zeros(0, np.intp)
+		# In OW, filter out domains (a streamed background is filtered chunk by chunk)
+		if self.openworld and not options.stream:
+			kept, skipped = self.backgroundFilter(fmt, loaded.foreground)
+			if len(kept) + len(skipped) < len(background):
+				raise WSCError('Error: Domain-Background File has fewer Links than the Background!')
+			if not options.quiet:
+				links = self.backgroundLinks(fmt)
+				for i in skipped[skipped < len(background)]:
+					print('\tSkipped: ' + self.resolver().domain(links[i]) + '//' + links[i])
+			background = background[kept[kept < len(background)]]
+		timer.stop(stage)
+		# Adjust classCount (a streamed background is not part of the dataset)
+		if self.openworld and not options.stream:
+			className -= 1
+		if options.main:
+			className -= loaded.sites
+
+		# Remove temporary data
+		if (options.storage == 'RemoveTemp' or options.storage == 'Low') and options.scaling != 'native':
+			os.remove(merged_file)
+			os.remove(merged_scaled_file)
+
+		# Check if Subpages can be split into folds
+		stage = timer.start('shuffle & limit')
+		if (className/loaded.sites) % self.folds == 0:
+			subpages = className//loaded.sites
+			if options.main:
+				subpages += 1
+		else:
+			raise WSCError('Error: Pages cannot be partitioned into equally sized folds!')
+
+		# Shuffle Arrays
+		loaded.streamSeed = None
+		if options.shuffleInstances:
+			# Instances of each page
+			for k in classes.keys():
+				rng.shuffle(classes[k])
+			if self.openworld and options.stream:
+				# the parts of the streamed background are drawn with this seed in every pass
+				loaded.streamSeed = rng.getrandbits(32)
+			elif self.openworld:
+				rng.shuffle(background)
+		if options.shuffleSubpages:
+			# Pages of each site
+			for k in range(1,loaded.sites+1):
+
+				lower = (k-1)*subpages+1
+				# Do not shuffle the main page!
+				if options.main:
+					lower += 1
+				higher = (k)*subpages
+
+				tmp = []
+				for j in range(lower, higher+1):
+					tmp.append(classes[j])
+				rng.shuffle(tmp)
+				tmp.reverse()
+				for j in range(lower, higher+1):
+					classes[j] = tmp.pop()
+		timer.stop(stage)
+
+		loaded.classes = classes
+		loaded.background = background
+		loaded.subpages = subpages
+		return loaded
+
+	def plan(self, loaded, configuration):
+		# Limits & folds of a configuration ((#subpages, #mainpages, #background), #subpages per site)
+		options = self.options; folds = self.folds
+		subpages = loaded.subpages
+		(perPage, perMainPage, bg_size), perSite = configuration
+		limitPage = perPage > -1
+		limitMainPage = perMainPage > -1
+		limitBackground = bg_size > -1 and self.openworld
+		limitSite = perSite > -1
+		classes = dict(loaded.classes)
+		background = loaded.background
+		pagesPerBGFold = 0
+		# every configuration records its own stages after the loading shared by all of them
+		timer = loaded.timer.branch()
+		self.backend.timer = timer
+
+		stage = timer.start('shuffle & limit')
+		pagesPerFold = (subpages - (1 if options.main else 0))//folds
+		if limitSite:
+			if perSite % folds != 0:
+				raise WSCError('Error: Limited Pages cannot be partitioned into equally sized folds!')
+			pagesPerFold = perSite//folds
+		else:
+			perSite = subpages - (1 if options.main else 0)
+
+		# Check if Background can be split into folds
+		if self.openworld:
+			available = loaded.backgroundCount if options.stream else len(background)
+			# Calculate Upper BG bound
+			if not limitBackground:
+				bg_size = available
+				if bg_size % folds != 0:
+					bg_size = bg_size//folds*folds
+
+			# Limit background size
+			if available >= bg_size:
+				background = background[:bg_size]
+			else:
+				raise WSCError('Error: Not enough instances in background! - only '+ str(available))
+
+			if bg_size % folds == 0:
+				pagesPerBGFold = bg_size//folds
+			else:
+				raise WSCError('Error: Background cannot be partitioned into equally sized folds!')
+
+		# Check for equal amount of instances and limit if desired
+		if limitPage:
+			instances=perPage
+		else:
+			instances = len(classes[2]) # Take as reference
+			perPage = instances
+		if limitMainPage:
+			instancesMain = perMainPage
+		else:
+			instancesMain = len(classes[1])
+			perMainPage = instancesMain
+
+		# Limit Instances First
+		for k in classes.keys():
+			# Check if we have a main page
+			if options.main and k % subpages == 1:
+				if limitMainPage:
+					if len(classes[k]) >= perMainPage:
+						classes[k] = classes[k][:perMainPage]
+						continue
+					else:
+						raise WSCError('Error: Mainpage does not have enough instances!')
+				else:
+					continue
+			if limitPage:
+				if len(classes[k]) >= perPage:
+					classes[k] = classes[k][:perPage]
+					continue
+				else:
+					raise WSCError('Error: Subpages do not have enough instances!')
+		# Check for same amount of instances Second
+		for k in classes.keys():
+			# Check if we have a main page
+			if options.main and k % subpages == 1:
+				if len(classes[k]) != instancesMain:
+					raise WSCError('Error: Mainpages do have the same amount of instances!')
+				else:
+					continue
+			if len(classes[k]) != instances:
+				raise WSCError('Error: Subpages do have the same amount of instances!')
+
+		scenario = loaded.scenario
+		if not options.separateEval:
+			scenario +=  '_' + str(loaded.sites) + 'S'
+		scenario += '_' + str(perSite) + 'SP_' + str(perPage) + 'ISP'
+		if options.main:
+			scenario += '_' + str(perMainPage) + 'IMP'
+		if self.openworld:
+			scenario += '_' + str(bg_size) + 'IBG'
+
+		timer.stop(stage)
+
+		plan = FoldPlan()
+		plan.loaded = loaded
+		plan.timer = timer
+		plan.classes = classes
+		plan.background = background
+		plan.sites = loaded.sites
+		plan.subpages = subpages
+		plan.limitSite = limitSite
+		plan.perSite = perSite
+		plan.perPage = perPage
+		plan.perMainPage = perMainPage
+		plan.bg_size = bg_size
+		plan.instances = instances
+		plan.instancesMain = instancesMain
+		plan.pagesPerFold = pagesPerFold
+		plan.pagesPerBGFold = pagesPerBGFold
+		plan.scenario = scenario
+		plan.prefix = os.path.join(options.outputpath, loaded.outputname + scenario)
+		# (c, g, rate) of every fold and the search history shared by the folds
+		plan.results = [None] * folds
+		plan.searchHistory = None
+		return plan
+
+	def evaluatePlan(self, plan, workers):
+		# Search, train, predict & score the folds of a plan
+		options = self.options; timer = plan.timer
+		# Perform CV once for all data, not for every fold
+		if options.quick:
+			self.quickSearch(plan, workers)
+		# for k folds: partition i is used for testing in fold i, the remaining k-1 partitions are used for training
+		if self.backend.usesFiles:
+			stage = timer.start('fold writing')
+			self.writeFolds(plan)
+			timer.stop(stage)
+		# perform evaluation
+		self.evaluation(plan, workers)
+		# remove temporary data
+		if options.storage == 'RemoveTemp' or options.storage == 'Low':
+			self.removeTemp(plan)
+		if options.timings:
+			timer.save(plan.prefix + '.timings', plan.prefix + '.trace.json')
+
+	def evaluateConfigurationProcess(self, loaded, configuration, workers):
+		# The process prints its error, the exit code reports it to the main process
+		try:
+			self.evaluatePlan(self.plan(loaded, configuration), workers)
+		except WSCError as error:
+			print(error)
+			sys.exit(1)
+
+	def sweepConfigurations(self, loaded, workers):
+		# Every configuration of the sweep evaluates a slice of the pages loaded once, forked processes
+		# share them read-only (configurations run one after another inside the pool of -separateEvaluation)
+		configurations = self.options.configurations()
+		parallelConfigurations = max(1, min(len(configurations), workers))
+		if multiprocessing.current_process().daemon:
+			parallelConfigurations = 1
+		configuration_workers = max(1, workers // parallelConfigurations)
+		failed = []
+		if parallelConfigurations == 1:
+			for configuration in configurations:
+				self.evaluatePlan(self.plan(loaded, configuration), configuration_workers)
+		else:
+			for start in range(0, len(configurations), parallelConfigurations):
+				processes = [ (configuration, forkContext.Process(target=self.evaluateConfigurationProcess, args=(loaded, configuration, configuration_workers))) for configuration in configurations[start:start+parallelConfigurations] ]
+				for _, process in processes:
+					process.start()
+				for configuration, process in processes:
+					process.join()
+					if process.exitcode != 0:
+						failed.append(configuration)
+		if failed:
+			raise WSCError('Error: Evaluation of the Limits ' + ', '.join([ '{0},{1},{2} {3}'.format(*(limits + (subpageLimit,))) for limits, subpageLimit in failed ]) + ' failed!')
+
+	def foldPages(self, plan, currentFold):
+		# Pages (classNumber, page) used for training and testing in this fold
+		trainPages = []; testPages = []
+		subpages = plan.subpages
+		site=0
+		for k in range(1,plan.sites*subpages+1):
+
+			if k % subpages == 1:
+				site += 1
+				# Filter out main pages
+				if not self.options.main:
+					continue
+
+			lower = currentFold + 1 +((site-1)*subpages)
+			higher = currentFold + plan.pagesPerFold + ((site-1)*subpages)
+
+			if self.options.simple:
+				classNumber = site
+			else:
+				classNumber = k
+
+			if k in range(lower, higher+1):
+				testPages.append((classNumber, k))
+			else:
+				trainPages.append((classNumber, k))
+
+		return trainPages, testPages
+
+	def quickPages(self, plan):
+		# Pages (classNumber, page) of all data used for a single CV
+		pages = []
+		className = 0
+		pageCount = 1
+		for k in plan.classes.keys():
+			# is the first page of a new website?
+			if k % plan.subpages == 1:
+				className += 1
+				pageCount = 1
+				# Even a main page?
+				if self.options.main:
+					pageCount -= 1
+			else:
+				if plan.limitSite:
+					if pageCount >= plan.perSite:
+						continue
+				pageCount += 1
+				if not self.options.simple:
+					className += 1
+			pages.append((className, k))
+
+		return pages
+
+	def quickSearch(self, plan, workers):
+		# One CV on all data, its parameters are used by every fold
+		options = self.options; timer = plan.timer
+		dataset = plan.loaded.dataset; loaded = plan.loaded
+		scaled_file = plan.prefix + '.scale'
+		status_file = plan.prefix + '.out'
+		gnuplot_file = plan.prefix + '.png'
+
+		stage = timer.start('fold writing')
+		if self.backend.usesFiles:
+			fout = open(scaled_file, 'w')
+			for classNumber, k in self.quickPages(plan):
+				dataset.writeLines(fout, classNumber, plan.classes[k])
+			if self.openworld and options.stream:
+				for chunk, parts in loaded.fmt.backgroundStream.chunks(loaded.scaler, loaded.foreground, self.foldAssigner(plan)):
+					for indices in parts:
+						chunk.writeLines(fout, 0, indices)
+			elif self.openworld:
+				dataset.writeLines(fout, 0, plan.background)
+			fout.close()
+			training = scaled_file
+		else:
+			parts = [ (classNumber, plan.classes[k]) for classNumber, k in self.quickPages(plan) ]
+			if self.openworld:
+				parts.append((0, plan.background))
+			training = dataset.select(parts)
+		timer.stop(stage)
+
+		if not options.quiet:
+			print(timestamp() + 'Cross validation...')
+		stage = timer.start('grid search')
+		if options.hierarchical:
+			# parameters of the site model, the subpage models use the same
+			training = wsc_hierarchy.siteData(training, plan.subpages, plan.prefix + '.site.scale')
+		c,g,rate = self.cachedGridSearch(training, self.featureCache.contentHash(training) if options.useCache else None, status_file, gnuplot_file, workers)
+		timer.stop(stage)
+
+		plan.results = [(c,g,rate)] * self.folds
+
+		if not options.quiet:
+			print(timestamp() + 'Best c={0}, g={1} CV rate={2}'.format(c,g,rate))
+
+		# Remove temporary data
+		if (options.storage == 'RemoveTemp' or options.storage == 'Low') and self.backend.usesFiles:
+			os.remove(scaled_file)
+			if options.hierarchical:
+				os.remove(plan.prefix + '.site.scale')
+
+	def writeFolds(self, plan):
+		# output training & testing, every page is formatted once and written to all folds
+		folds = self.folds; loaded = plan.loaded; dataset = loaded.dataset
+		ftrainout = {}; ftestout = {}; splits = {}
+		for currentFold in range(1, folds+1):
+			ftrainout[currentFold] = open(plan.prefix + '_' + str(currentFold) + '.train', 'w')
+			ftestout[currentFold] = open(plan.prefix + '_' + str(currentFold) + '.test', 'w')
+			trainPages, testPages = self.foldPages(plan, currentFold)
+			splits[currentFold] = (dict((k, classNumber) for classNumber, k in trainPages), dict((k, classNumber) for classNumber, k in testPages))
+
+		# iterate through each page
+		for k in range(1,plan.sites*plan.subpages+1):
+			lines = None
+			for currentFold in range(1, folds+1):
+				trainPages, testPages = splits[currentFold]
+				if k in testPages:
+					fout = ftestout[currentFold]; classNumber = testPages[k]
+				elif k in trainPages:
+					fout = ftrainout[currentFold]; classNumber = trainPages[k]
+				else:
+					continue
+				if lines is None:
+					lines = dataset.formatLines(classNumber, plan.classes[k])
+				fout.write(lines)
+
+		if self.openworld and self.options.stream:
+			# append background chunk by chunk, the parts of a chunk are written in order
+			for chunk, parts in loaded.fmt.backgroundStream.chunks(loaded.scaler, loaded.foreground, self.foldAssigner(plan)):
+				for part in range(1, folds+1):
+					lines = chunk.formatLines(0, parts[part-1])
+					for currentFold in range(1, folds+1):
+						if currentFold == part:
+							ftestout[currentFold].write(lines)
+						else:
+							ftrainout[currentFold].write(lines)
+		elif self.openworld:
+			# append background, part i is tested in fold i
+			for part in range(1, folds+1):
+				lower = (part-1)*plan.pagesPerBGFold
+				higher = part*plan.pagesPerBGFold
+				for start in range(lower, higher, 4096):
+					lines = dataset.formatLines(0, plan.background[start:min(start+4096, higher)])
+					for currentFold in range(1, folds+1):
+						if currentFold == part:
+							ftestout[currentFold].write(lines)
+						else:
+							ftrainout[currentFold].write(lines)
+
+		for currentFold in range(1, folds+1):
+			ftrainout[currentFold].close()
+			ftestout[currentFold].close()
+
+	def foldInput(self, plan, currentFold):
+		# In-memory training & testing (labels, features) of this fold
+		classes = plan.classes; background = plan.background
+		trainPages, testPages = self.foldPages(plan, currentFold)
+		trainParts = [ (classNumber, classes[k]) for classNumber, k in trainPages ]
+		testParts = [ (classNumber, classes[k]) for classNumber, k in testPages ]
+
+		if self.openworld:
+			lower = (currentFold-1)*plan.pagesPerBGFold
+			higher = currentFold*plan.pagesPerBGFold
+			testParts.append((0, background[lower:higher]))
+			trainParts.append((0, background[:lower]))
+			trainParts.append((0, background[higher:]))
+
+		return plan.loaded.dataset.select(trainParts), plan.loaded.dataset.select(testParts)
+
+	def fold(self, plan, currentFold):
+		# Training & testing data of a fold, written by writeFolds() for backends with usesFiles
+		options = self.options; featureCache = self.featureCache
+		fold = Fold(plan, currentFold)
+		if self.backend.usesFiles:
+			fold.training = fold.prefix + '.train'; fold.testing = fold.prefix + '.test'
+		else:
+			stage = plan.timer.start('fold writing', currentFold)
+			fold.training, fold.testing = self.foldInput(plan, currentFold)
+			plan.timer.stop(stage)
+		fold.trainKey = featureCache.contentHash(fold.training) if options.useCache else None
+		# the hierarchical site model is searched on the training data labeled with websites,
+		# with -quickCV YES it is only built when the site model is trained (wsc_hierarchy.classify)
+		fold.searchTraining = fold.training; fold.searchKey = fold.trainKey
+		if options.hierarchical and options.quick:
+			fold.searchTraining = None; fold.searchKey = None
+		elif options.hierarchical:
+			fold.searchTraining = wsc_hierarchy.siteData(fold.training, plan.subpages, fold.prefix + '.site.train')
+			fold.searchKey = featureCache.contentHash(fold.searchTraining) if options.useCache else None
+		# unchanged folds are copied from wsc_cache/ instead of trained and tested again
+		fold.testKey = featureCache.contentHash(fold.testing) if options.useCache else None
+		return fold
+
+	def foldKeys(self, plan, fold):
+		# cache keys of the model & predictions with the fold's parameters
+		if not self.options.useCache:
+			return None, None
+		c, g = plan.results[fold.number-1][0], plan.results[fold.number-1][1]
+		modelKey = self.featureCache.key('model', self.backendIdentity, fold.trainKey, c, g)
+		return modelKey, self.featureCache.key('predict', modelKey, fold.testKey)
+
+	def search(self, plan, fold, workers):
+		# CV for each fold, every fold keeps its own status file to resume
+		options = self.options; timer = plan.timer
+		status_file = fold.prefix + '.out'
+		gnuplot_file = fold.prefix + '.png'
+
+		self.progress(fold, 'Cross Validation...')
+		stage = timer.start('grid search', fold.number)
+		if options.shareSearch:
+			plan.results[fold.number-1] = self.sharedGridSearch(plan, fold.searchTraining, fold.searchKey, status_file, gnuplot_file, workers, fold.number)
+		else:
+			plan.results[fold.number-1] = self.cachedGridSearch(fold.searchTraining, fold.searchKey, status_file, gnuplot_file, workers, fold=fold.number)
+		timer.stop(stage)
+
+		self.progress(fold, 'Best c={0}, g={1} CV rate={2}'.format(*plan.results[fold.number-1]))
+		return plan.results[fold.number-1]
+
+	def train(self, plan, fold):
+		# model for the fold's parameters, None if it is taken from wsc_cache/
+		timer = plan.timer
+		c, g = plan.results[fold.number-1][0], plan.results[fold.number-1][1]
+		modelKey, _ = self.foldKeys(plan, fold)
+		model_file = fold.prefix + '.model'
+		self.progress(fold, 'Training...')
+		stage = timer.start('train', fold.number)
+		model = None
+		if not self.featureCache.loadFile('model', modelKey, model_file):
+			model = self.backend.train(fold.training, model_file, c, g)
+			self.featureCache.storeFile('model', modelKey, model_file)
+		timer.stop(stage)
+		return model
+
+	def predict(self, plan, fold, model=None):
+		# predictions of the fold's testing data in _<fold>.predict
+		timer = plan.timer
+		_, predictKey = self.foldKeys(plan, fold)
+		self.progress(fold, 'Testing...')
+		stage = timer.start('predict', fold.number)
+		if not self.featureCache.loadFile('predict', predictKey, fold.prefix + '.predict'):
+			if model is None:
+				model = self.backend.loadModel(fold.prefix + '.model')
+			self.backend.predict(fold.testing, model, fold.prefix + '.predict', fold.output)
+			self.featureCache.storeFile('predict', predictKey, fold.prefix + '.predict')
+		timer.stop(stage)
+
+	def classifyHierarchical(self, plan, fold, workers):
+		# site model and subpage models of each website, their subpage predictions are cached as a whole
+		options = self.options; timer = plan.timer
+		c, g = plan.results[fold.number-1][0], plan.results[fold.number-1][1]
+		_, predictKey = self.foldKeys(plan, fold)
+		self.progress(fold, 'Training & Testing Websites, then Subpages...')
+		stage = timer.start('hierarchical', fold.number)
+		hierarchicalKey = self.featureCache.key('hierarchical', predictKey, plan.subpages) if options.useCache else None
+		if not self.featureCache.loadFile('predict', hierarchicalKey, fold.prefix + '.predict'):
+			wsc_hierarchy.classify(self.backend, fold.training, fold.searchTraining, fold.testing, c, g, plan.subpages, fold.prefix, fold.prefix + '.predict', workers, fold.output)
+			self.featureCache.storeFile('predict', hierarchicalKey, fold.prefix + '.predict')
+		timer.stop(stage)
+
+	def predictExact(self, plan, fold):
+		# exact RBF model with the same parameters, its predictions are compared in score()
+		featureCache = self.featureCache; timer = plan.timer
+		c, g = plan.results[fold.number-1][0], plan.results[fold.number-1][1]
+		exact_predict_file = fold.prefix + '.exact.predict'
+		exactKey = featureCache.key('predict', self.exactIdentity, fold.trainKey, fold.testKey, c, g) if self.options.useCache else None
+		stage = timer.start('exact', fold.number)
+		if not featureCache.loadFile('predict', exactKey, exact_predict_file):
+			self.exactBackend.predict(fold.testing, self.exactBackend.train(fold.training, fold.prefix + '.exact.model', c, g), exact_predict_file)
+			featureCache.storeFile('predict', exactKey, exact_predict_file)
+		timer.stop(stage)
+
+	def progress(self, fold, text):
+		if not self.options.quiet:
+			fold.output.write(timestamp() + 'Fold: {0:>3} - '.format(fold.number) + text + '\n')
+
+	def evaluateFold(self, plan, currentFold, workers, output=None):
+		fold = self.fold(plan, currentFold)
+		if output is not None:
+			fold.output = output
+		if not self.options.quick:
+			self.search(plan, fold, workers)
+		if self.options.hierarchical:
+			self.classifyHierarchical(plan, fold, workers)
+		else:
+			self.predict(plan, fold, self.train(plan, fold))
+		if self.compareExact:
+			self.predictExact(plan, fold)
+
+	def cachedGridSearch(self, training, trainKey, status_file, gnuplot_file, workers, region=None, fold=None):
+		# backend.gridSearch, its result and status file are taken from wsc_cache/ if the training data,
+		# the region and the backend did not change
+		if trainKey is None:
+			return self.backend.gridSearch(training, status_file, gnuplot_file, workers, region)
+		key = self.featureCache.key('search', self.backendIdentity, trainKey, region)
+		cached = self.featureCache.loadResult('search', key)
+		if cached is not None:
+			fstatus = open(status_file, 'w')
+			fstatus.write(cached['status'])
+			fstatus.close()
+			self.searchStore.store(trainKey, self.rateIdentity, fold, readGridStatus(status_file))
+			return tuple(cached['result'])
+		# grid points cross validated on this training data by any earlier search are not repeated,
+		# the points of this search are stored even if it is interrupted
+		# The status file of an earlier run with this name may belong to other training data:
+		# it is replaced by the stored rates of this training data
+		if os.path.isfile(status_file):
+			os.remove(status_file)
+		try:
+			result = self.backend.gridSearch(training, status_file, gnuplot_file, workers, region, self.searchStore.load(trainKey, self.rateIdentity))
+		finally:
+			self.searchStore.store(trainKey, self.rateIdentity, fold, readGridStatus(status_file))
+		status = ''
+		if os.path.isfile(status_file):
+			fstatus = open(status_file, 'r')
+			status = fstatus.read()
+			fstatus.close()
+		self.featureCache.storeResult('search', key, { 'result': result, 'status': status })
+		return result
+
+	def sharedGridSearch(self, plan, training, trainKey, status_file, gnuplot_file, workers, fold=None):
+		# Search the region learned from earlier folds, widen it while the optimum lies on its border
+		searchHistory = plan.searchHistory
+		region = searchHistory.region()
+		while True:
+			c, g, rate = self.cachedGridSearch(training, trainKey, status_file, gnuplot_file, workers, region, fold)
+			best = searchHistory.point(c, g)
+			if region is not None:
+				region = searchHistory.expand(region, best)
+			if region is None:
+				break
+		searchHistory.add(fold, readGridStatus(status_file), best)
+		return (c, g, rate)
+
+	def evaluation(self, plan, workers):
+		# Folds of a plan, then score()
+		options = self.options; folds = self.folds
+		firstFold = 1
+		if options.shareSearch and not options.quick:
+			# The first fold searches the whole grid alone, the others start from its results
+			plan.searchHistory = SearchHistory(self.backend.c_seq, self.backend.g_seq)
+			self.evaluateFold(plan, 1, workers)
+			firstFold = 2
+
+		# Folds are independent: run them concurrently within the CPU budget (-worker)
+		# svm-train/svm-predict use a single core, grid.py gets the remaining share
+		parallelFolds = max(1, min(folds - firstFold + 1, workers))
+		grid_workers = max(1, workers // parallelFolds)
+		# Parallel folds write to a buffer each, printed in fold order once they are done
+		outputs = dict((currentFold, None) for currentFold in range(firstFold, folds+1))
+		if parallelFolds > 1 and not options.quiet:
+			outputs = dict((currentFold, io.StringIO()) for currentFold in outputs)
+		# the searches of parallel folds share the memory of precomputed kernels
+		self.backend.concurrentSearches = parallelFolds
+		pool = ThreadPool(parallelFolds)
+		try:
+			pool.map(lambda currentFold: self.evaluateFold(plan, currentFold, grid_workers, outputs[currentFold]), range(firstFold, folds+1), 1)
+		finally:
+			pool.close()
+			pool.join()
+			self.backend.concurrentSearches = 1
+			for currentFold in sorted(outputs):
+				if outputs[currentFold] is not None:
+					sys.stdout.write(outputs[currentFold].getvalue())
+			sys.stdout.flush()
+
+		return self.score(plan)
+
+	def mergedPredictions(self, plan, extension):
+		# (predicted, real) websites (or pages) of all folds
+		predicted, real = loadPredictions([ plan.prefix + '_' + str(currentFold) + extension for currentFold in range(1, self.folds+1) ])
+		if not self.options.simple:
+			predicted = siteLabels(predicted, plan.subpages)
+			real = siteLabels(real, plan.subpages)
+		return predicted, real
+
+	def score(self, plan):
+		# merge result for each fold, returns its Metrics
+		options = self.options; timer = plan.timer
+		result_file = plan.prefix + '.result'
+		metrics_file = plan.prefix + '.metrics'
+
+		stage = timer.start('result merge')
+		predicted, real = self.mergedPredictions(plan, '.predict')
+		writeResult(result_file, predicted, real)
+
+		metrics = Metrics(predicted, real, self.openworld)
+		metrics.save(metrics_file, options.bootstrap)
+		correct = metrics.correct; wrong = metrics.wrong
+		timer.stop(stage)
+
+		if self.compareExact:
+			exact_metrics_file = plan.prefix + '.exact.metrics'
+			exactPredicted, exactReal = self.mergedPredictions(plan, '.exact.predict')
+			exactMetrics = Metrics(exactPredicted, exactReal, self.openworld)
+			exactMetrics.save(exact_metrics_file, options.bootstrap)
+
+		if not options.quiet:
+			print('Output prediction: {0}'.format(result_file))
+			print('Output metrics: {0}'.format(metrics_file))
+			if self.compareExact:
+				print('Output exact metrics: {0}'.format(exact_metrics_file))
+		total = plan.sites*plan.instances*plan.pagesPerFold*self.folds+(plan.bg_size if self.openworld else 0)
+		if options.separateEval:
+			print(plan.loaded.name + ': Correct: ' + str(correct) + ' Wrong: ' + str(wrong) + ' of ' + str(total))
+
+			result_file_merged = os.path.join(options.outputpath, options.outputname + '_Separate' + plan.scenario + '.result')
+			result = open(result_file_merged, 'a')
+			result.write('%s %d %d %d %d\n' % (plan.loaded.name, metrics.tp, metrics.fp, metrics.fn, metrics.tn))
+			result.close()
+		else:
+			print('Correct: ' + str(correct) + ' Wrong: ' + str(wrong) + ' of ' + str(total))
+
+		if self.compareExact:
+			print('Exact RBF: Correct: ' + str(exactMetrics.correct) + ' Wrong: ' + str(exactMetrics.wrong) + ' - Accuracy Difference (approximate - exact): {0:+.2f}%'.format(
+				100.0 * (correct - exactMetrics.correct) / max(correct + wrong, 1)))
+
+		if options.search == 'halving':
+			# Searches of this evaluation (one for quickCV, else one per fold)
+			if options.quick:
+				status_files = [ plan.prefix + '.out' ]
+			else:
+				status_files = [ plan.prefix + '_' + str(currentFold) + '.out' for currentFold in range(1, self.folds+1) ]
+			reports = [ self.backend.searchReports[status_file] for status_file in status_files if status_file in self.backend.searchReports ]
+			if reports:
+				print('Halving Search: {0} of {1} grid points cross validated on all instances, gave up at least {2}% CV accuracy'.format(sum([ full for full, _, _ in reports ]), sum([ points for _, points, _ in reports ]), max([ givenUp for _, _, givenUp in reports ])))
+
+		return metrics
+
+	def removeTemp(self, plan):
+		for currentFold in range(1, self.folds+1):
+			prefix = plan.prefix + '_' + str(currentFold)
+			if self.backend.usesFiles:
+				os.remove(prefix + '.train')
+				os.remove(prefix + '.test')
+				if self.options.hierarchical and not self.options.quick:
+					os.remove(prefix + '.site.train')
+			os.remove(prefix + '.predict')
+			if self.compareExact:
+				os.remove(prefix + '.exact.predict')
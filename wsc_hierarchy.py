@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+# Hierarchical site-then-subpage classification for easy_WSC.py -hierarchical YES (-simple NO)
+#   a site model separates the websites (and the background), a subpage model per website only
+#   separates the subpages of its website and only predicts the instances routed to it,
+#   instead of one model over all subpage classes (one-vs-one grows with (sites x subpages)^2)
+#   the subpage models of a fold are trained in parallel
+# The prediction file keeps the subpage classes, so siteLabels() maps it to websites as before.
+# Fold data are files (subprocess backend) or (labels, features) arrays (in-memory backends).
+
+from multiprocessing.pool import ThreadPool
+import os
+import numpy as np
+from wsc_metrics import loadPredictions, siteLabels
+
+class FoldData(object):
+
+	def __init__(self, data):
+		self.data = data
+		if isinstance(data, tuple):
+			self.lines = None
+			self.labels = np.asarray(data[0]).astype(np.int64)
+		else:
+			fin = open(data, 'r')
+			self.lines = [ line.split(' ', 1) for line in fin if line.strip() ]
+			fin.close()
+			self.labels = np.array([ int(float(line[0])) for line in self.lines ], np.int64)
+
+	def subset(self, rows, labels, filename):
+		# the given instances with new labels, written to filename for file based backends
+		if self.lines is None:
+			return np.asarray(labels, np.int32), self.data[1][rows]
+		fout = open(filename, 'w')
+		fout.write(''.join([ '%d %s' % (label, self.lines[row][1] if len(self.lines[row]) > 1 else '\n') for row, label in zip(rows, labels) ]))
+		fout.close()
+		return filename
+
+def siteData(data, subpages, filename):
+	# Fold data labeled with websites (0 stays the background), for the site model and its search
+	data = data if isinstance(data, FoldData) else FoldData(data)
+	return data.subset(np.arange(len(data.labels)), siteLabels(data.labels, subpages), filename)
+
+def classify(backend, training, siteTraining, testing, c, g, subpages, prefix, predict_file, workers=1, output=None):
+	# Writes the subpage predictions of testing to predict_file, siteTraining is siteData(training)
+	# or None to build it here, the accuracies of the models are written to output (default sys.stdout)
+	train = FoldData(training); test = FoldData(testing)
+	sites = siteLabels(train.labels, subpages)
+	temporary = []
+	if siteTraining is None:
+		siteTraining = siteData(train, subpages, prefix + '.site.train')
+		temporary.append(prefix + '.site.train')
+
+	# Site model: which website (or the background) each testing instance belongs to
+	model = backend.train(siteTraining, prefix + '.site.model', c, g)
+	site_testing = siteData(test, subpages, prefix + '.site.test')
+	backend.predict(site_testing, model, prefix + '.site.predict', output)
+	routed, _ = loadPredictions([ prefix + '.site.predict' ])
+	temporary += [ prefix + '.site.test', prefix + '.site.predict' ]
+
+	def subpageModel(site):
+		# Subpages of a website, only for the instances routed to it
+		rows = np.flatnonzero(sites == site)
+		tested = np.flatnonzero(routed == site)
+		classes = np.unique(train.labels[rows])
+		if len(classes) == 1:
+			return tested, np.full(len(tested), classes[0])
+		name = prefix + '.site' + str(site)
+		model = backend.train(train.subset(rows, train.labels[rows], name + '.train'), name + '.model', c, g)
+		backend.predict(test.subset(tested, test.labels[tested], name + '.test'), model, name + '.predict', output)
+		temporary.extend([ name + '.train', name + '.test', name + '.predict' ])
+		return tested, loadPredictions([ name + '.predict' ])[0]
+
+	# the background keeps its site prediction (0)
+	predicted = routed.copy()
+	jobs = [ site for site in np.unique(routed).tolist() if site != 0 ]
+	pool = ThreadPool(max(1, min(workers, len(jobs))))
+	try:
+		for tested, subpagePredicted in pool.map(subpageModel, jobs, 1):
+			predicted[tested] = subpagePredicted
+	finally:
+		pool.close()
+		pool.join()
+
+	fpredict = open(predict_file, 'w')
+	fpredict.write(''.join([ '%d,%d\n' % (pred, real) for pred, real in zip(predicted.tolist(), test.labels.tolist()) ]))
+	fpredict.close()
+	# models are kept like the models of the folds
+	for filename in temporary:
+		if os.path.isfile(filename):
+			os.remove(filename)
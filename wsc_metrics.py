@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+# Metrics of merged WSC predictions
+#   confusion matrix, per-class precision & recall, accuracy and (open world) TPR/FPR
+#   bootstrap confidence intervals resample the counts of the confusion matrix instead of the
+#   predictions: every statistic only depends on these counts, so a resample of n predictions
+#   is a multinomial draw over its cells and costs the same for thousands or millions of lines
+#
+# Labels are class numbers, 0 is the background in the open world.
+
+import json, warnings
+import numpy as np
+
+def loadPredictions(predict_files):
+	# "predicted,real" lines of all files -> (predicted, real) int arrays
+	text = []
+	for predict_file in predict_files:
+		fpredict = open(predict_file, 'r')
+		text.append(fpredict.read())
+		fpredict.close()
+	values = np.array(''.join(text).replace(',', ' ').split(), np.int64).reshape(-1, 2)
+	return values[:, 0].copy(), values[:, 1].copy()
+
+def siteLabels(labels, subpages):
+	# Subpage classes 1..subpages belong to site 1, the next subpages to site 2, ... (0 stays 0)
+	return -(-labels // subpages)
+
+def writeResult(result_file, predicted, real):
+	fresult = open(result_file, 'w')
+	np.savetxt(fresult, np.column_stack((predicted, real)), fmt='%d', delimiter=',')
+	fresult.close()
+
+def confusionMatrix(predicted, real, classes):
+	# rows: real class, columns: predicted class, both in the (sorted) order of classes
+	k = len(classes)
+	counts = np.bincount(np.searchsorted(classes, real) * k + np.searchsorted(classes, predicted), minlength=k*k)
+	return counts.reshape(k, k)
+
+def ratio(numerator, denominator):
+	with np.errstate(divide='ignore', invalid='ignore'):
+		return np.where(denominator > 0, numerator / np.maximum(denominator, 1.0), np.nan)
+
+def interval(samples, confidence):
+	# Percentile interval over the resamples (first axis)
+	tail = (1.0 - confidence) / 2 * 100
+	# classes without any prediction stay undefined (NaN) in every resample
+	with warnings.catch_warnings():
+		warnings.simplefilter('ignore', RuntimeWarning)
+		return np.nanpercentile(samples, [ tail, 100 - tail ], axis=0)
+
+def jsonValue(value):
+	# NaN (undefined ratio) -> null
+	if isinstance(value, np.ndarray):
+		return [ jsonValue(item) for item in value.tolist() ]
+	if isinstance(value, list):
+		return [ jsonValue(item) for item in value ]
+	if isinstance(value, float) and value != value:
+		return None
+	return value
+
+class Metrics(object):
+
+	def __init__(self, predicted, real, openworld=False):
+		self.predicted = np.asarray(predicted)
+		self.real = np.asarray(real)
+		self.openworld = openworld
+		self.instances = len(self.real)
+		hit = self.predicted == self.real
+		self.correct = int(np.count_nonzero(hit))
+		self.wrong = self.instances - self.correct
+		# tp/fn: foreground site right/wrong, tn/fp: background right/wrong
+		foreground = self.real != 0
+		self.tp = int(np.count_nonzero(hit & foreground))
+		self.fn = int(np.count_nonzero(~hit & foreground))
+		self.tn = int(np.count_nonzero(hit & ~foreground))
+		self.fp = int(np.count_nonzero(~hit & ~foreground))
+		self.classes = np.unique(np.concatenate((self.real, self.predicted)))
+		self.confusion = confusionMatrix(self.predicted, self.real, self.classes)
+
+	def classCounts(self):
+		# (tp, fn, fp, rest) of every class, shape (classes, 4)
+		tp = np.diag(self.confusion)
+		fn = self.confusion.sum(axis=1) - tp
+		fp = self.confusion.sum(axis=0) - tp
+		rest = self.instances - tp - fn - fp
+		return np.column_stack((tp, fn, fp, rest))
+
+	def summary(self, resamples=1000, confidence=0.95, seed=0):
+		result = { 'instances': self.instances, 'correct': self.correct, 'wrong': self.wrong }
+		counts = self.classCounts()
+		precision = ratio(counts[:, 0], counts[:, 0] + counts[:, 2])
+		recall = ratio(counts[:, 0], counts[:, 0] + counts[:, 1])
+		result['classes'] = self.classes.tolist()
+		result['confusion'] = self.confusion.tolist()
+		result['accuracy'] = { 'value': ratio(self.correct, self.instances).item() }
+		result['precision'] = { 'value': precision }
+		result['recall'] = { 'value': recall }
+		if self.openworld:
+			result['tp'] = self.tp; result['fn'] = self.fn; result['fp'] = self.fp; result['tn'] = self.tn
+			result['tpr'] = { 'value': ratio(self.tp, self.tp + self.fn).item() }
+			result['fpr'] = { 'value': ratio(self.fp, self.fp + self.tn).item() }
+
+		if resamples > 0 and self.instances > 0:
+			rng = np.random.RandomState(seed)
+			n = self.instances
+			# accuracy, TPR & FPR from one resample of (tp, fn, fp, tn)
+			overall = np.array([ self.tp, self.fn, self.fp, self.tn ], dtype=np.float64)
+			samples = rng.multinomial(n, overall / n, size=resamples).astype(np.float64)
+			result['accuracy']['ci'] = interval((samples[:, 0] + samples[:, 3]) / n, confidence)
+			if self.openworld:
+				result['tpr']['ci'] = interval(ratio(samples[:, 0], samples[:, 0] + samples[:, 1]), confidence)
+				result['fpr']['ci'] = interval(ratio(samples[:, 2], samples[:, 2] + samples[:, 3]), confidence)
+			# per class: resamples x classes x (tp, fn, fp, rest)
+			samples = np.empty((resamples, len(self.classes), 4))
+			for i in range(len(self.classes)):
+				samples[:, i] = rng.multinomial(n, counts[i] / float(n), size=resamples)
+			result['precision']['ci'] = interval(ratio(samples[:, :, 0], samples[:, :, 0] + samples[:, :, 2]), confidence).T
+			result['recall']['ci'] = interval(ratio(samples[:, :, 0], samples[:, :, 0] + samples[:, :, 1]), confidence).T
+			result['bootstrap'] = { 'resamples': resamples, 'confidence': confidence, 'seed': seed }
+
+		for name in [ 'accuracy', 'precision', 'recall', 'tpr', 'fpr' ]:
+			if name in result:
+				result[name] = dict((key, jsonValue(value)) for key, value in result[name].items())
+		return result
+
+	def save(self, metrics_file, resamples=1000, confidence=0.95, seed=0):
+		fmetrics = open(metrics_file, 'w')
+		json.dump(self.summary(resamples, confidence, seed), fmetrics, sort_keys=True)
+		fmetrics.write('\n')
+		fmetrics.close()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+# Native replacement for libSVM's svm-scale on parsed feature arrays
+#   same arithmetic as svm-scale (default range -1..1, features that are not set count as 0,
+#   constant features are dropped), the output lines are identical to "svm-scale -s"
+#   range files use svm-scale's format and can be exchanged with "svm-scale -r"
+#
+# Features are kept as dense (instances x features) arrays, column i holds feature index i+1.
+
+import numpy as np
+
+# Rows that are scaled at once, bounds the temporary masks
+chunkSize = 65536
+
+def parseInstances(text):
+	# libSVM text format -> (labels, features) as float64 arrays
+	lines = text.count('\n') + (1 if text and not text.endswith('\n') else 0)
+	if lines == 0:
+		return np.zeros(0), np.zeros((0, 0))
+	first = text[:text.find('\n')] if '\n' in text else text
+	width = len(first.split()) - 1
+	# Fast path: every line holds the features 1..width in order
+	try:
+		values = np.array(text.replace(':', ' ').split(), np.float64)
+	except ValueError:
+		values = np.zeros(0)
+	if width > 0 and values.size == lines * (1 + 2*width):
+		values = values.reshape(lines, 1 + 2*width)
+		if (values[:, 1::2] == np.arange(1, width+1)).all():
+			return values[:, 0].copy(), np.ascontiguousarray(values[:, 2::2])
+	# Sparse or irregular lines
+	labels = []; rows = []
+	width = 0
+	for line in text.splitlines():
+		items = line.split()
+		if not items:
+			continue
+		labels.append(float(items[0]))
+		row = {}
+		for item in items[1:]:
+			index, value = item.split(':')
+			row[int(index)] = float(value)
+			width = max(width, int(index))
+		rows.append(row)
+	features = np.zeros((len(rows), width))
+	for i, row in enumerate(rows):
+		for index, value in row.items():
+			features[i, index-1] = value
+	return np.array(labels), features
+
+def blockRange(features):
+	# (instances, min, max) of a block, blocks can be ranged once and shared between scalers
+	if features.shape[0] == 0:
+		return 0, np.full(features.shape[1], np.inf), np.full(features.shape[1], -np.inf)
+	return features.shape[0], features.min(axis=0), features.max(axis=0)
+
+class Scaler(object):
+
+	def __init__(self, lower=-1.0, upper=1.0):
+		self.lower = lower
+		self.upper = upper
+		self.feature_min = np.zeros(0)
+		self.feature_max = np.zeros(0)
+
+	def fit(self, blocks):
+		# Range of every feature over all blocks, missing features count as 0
+		return self.fitRanges([ blockRange(features) for features in blocks ])
+
+	def fitRanges(self, ranges):
+		# Same as fit on the blocks the ranges were taken from (see blockRange)
+		width = max([ len(fmin) for _, fmin, _ in ranges ] + [ 0 ])
+		self.feature_min = np.full(width, np.inf)
+		self.feature_max = np.full(width, -np.inf)
+		for count, fmin, fmax in ranges:
+			if count == 0:
+				continue
+			n = len(fmin)
+			np.minimum(self.feature_min[:n], fmin, out=self.feature_min[:n])
+			np.maximum(self.feature_max[:n], fmax, out=self.feature_max[:n])
+			if n < width:
+				np.minimum(self.feature_min[n:], 0, out=self.feature_min[n:])
+				np.maximum(self.feature_max[n:], 0, out=self.feature_max[n:])
+		return self
+
+	def save(self, range_file):
+		frange = open(range_file, 'w')
+		frange.write('x\n')
+		frange.write('%.16g %.16g\n' % (self.lower, self.upper))
+		for i in range(len(self.feature_min)):
+			if self.feature_min[i] != self.feature_max[i]:
+				frange.write('%d %.16g %.16g\n' % (i+1, self.feature_min[i], self.feature_max[i]))
+		frange.close()
+
+	def load(self, range_file):
+		frange = open(range_file, 'r')
+		lines = [ line.split() for line in frange if line.strip() ]
+		frange.close()
+		# Skip the target scaling (y) section
+		if lines[0] == [ 'y' ]:
+			lines = lines[3:]
+		self.lower, self.upper = map(float, lines[1])
+		ranges = [ (int(index), float(fmin), float(fmax)) for index, fmin, fmax in lines[2:] ]
+		width = max([ index for index, _, _ in ranges ] + [ 0 ])
+		# Features without a range are scaled to 0 like in svm-scale
+		self.feature_min = np.zeros(width)
+		self.feature_max = np.zeros(width)
+		for index, fmin, fmax in ranges:
+			self.feature_min[index-1] = fmin
+			self.feature_max[index-1] = fmax
+		return self
+
+	def transform(self, features):
+		# Scales features in place (as far as the width allows) and returns them
+		width = len(self.feature_min)
+		if features.shape[1] < width:
+			features = np.hstack((features, np.zeros((features.shape[0], width - features.shape[1]), features.dtype)))
+		elif features.shape[1] > width:
+			features = features[:, :width]
+		fmin = self.feature_min.astype(features.dtype)
+		fmax = self.feature_max.astype(features.dtype)
+		span = fmax - fmin
+		constant = span == 0
+		with np.errstate(divide='ignore', invalid='ignore'):
+			for start in range(0, features.shape[0], chunkSize):
+				chunk = features[start:start+chunkSize]
+				atMin = chunk == fmin
+				atMax = chunk == fmax
+				# same order of operations as svm-scale
+				chunk -= fmin
+				chunk *= (self.upper - self.lower)
+				chunk /= span
+				chunk += self.lower
+				chunk[atMax] = self.upper
+				chunk[atMin] = self.lower
+				chunk[:, constant] = 0
+		return features
+
+def roundPrecision(features, digits=6):
+	# Rounds (in place) to the significant digits of svm-scale's "%g" output. Rounded values
+	# survive a float32 cast and are written exactly as svm-scale would have written them.
+	with np.errstate(divide='ignore'):
+		for start in range(0, features.shape[0], chunkSize):
+			chunk = features[start:start+chunkSize]
+			nonzero = chunk != 0
+			values = chunk[nonzero]
+			exponent = np.maximum(np.floor(np.log10(np.abs(values))), -300)
+			power = digits - 1 - exponent
+			scaled = values * 10.0 ** power
+			rounded = np.rint(scaled) / 10.0 ** power
+			# printf rounds the exact binary value, the product can be off near a tie (x.5 in the last
+			# digit), and powers of 10 beyond 1e22 are not exact: these values are formatted with "%g"
+			formatted = (np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6) | (np.abs(power) > 22)
+			rounded[formatted] = [ float('%.*g' % (digits, value)) for value in values[formatted].tolist() ]
+			chunk[nonzero] = rounded
+	return features
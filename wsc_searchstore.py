@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+# Persistent CV rates of grid points for the searches of easy_WSC.py (wsc_cache/search.sqlite)
+#   a row holds the CV rate of (log2c, log2g) on a training set, keyed by the content hash of the
+#   training data and the settings the rate depends on (backend, its tools, CV folds), not by
+#   output names or the searched region: renamed outputs, other regions or -quickCV settings
+#   reuse every grid point that was cross validated on the same data before
+#   the fold the rate was first found in is kept for reference
+# Searches read the known rates of their region before they start and add their status file when
+# they end (also if they are interrupted). Concurrent runs on the same host share the database:
+# every call opens its own connection, writes are single transactions in WAL mode and wait for
+# locks of other writers.
+
+import os, sqlite3
+from wsc_cache import makedirs
+
+# Seconds a write waits for the lock of another run
+lockTimeout = 600
+
+def gridValue(value):
+	# log2c/log2g as key, 'null' if the parameter is not searched (like grid.py)
+	return 'null' if value is None else repr(float(value))
+
+def parseGridValue(value):
+	return None if value == 'null' else float(value)
+
+class SearchStore(object):
+
+	def __init__(self, filename):
+		self.filename = filename
+		makedirs(os.path.dirname(filename))
+		connection = self.connect()
+		try:
+			connection.execute('PRAGMA journal_mode=WAL')
+			with connection:
+				connection.execute('CREATE TABLE IF NOT EXISTS rates (dataset TEXT NOT NULL, settings TEXT NOT NULL, fold INTEGER, '
+				                   'log2c TEXT NOT NULL, log2g TEXT NOT NULL, rate REAL NOT NULL, '
+				                   'PRIMARY KEY (dataset, settings, log2c, log2g))')
+		finally:
+			connection.close()
+
+	def connect(self):
+		return sqlite3.connect(self.filename, timeout=lockTimeout)
+
+	def load(self, dataset, settings):
+		# {(log2c, log2g): rate} of a training set
+		connection = self.connect()
+		try:
+			rows = connection.execute('SELECT log2c, log2g, rate FROM rates WHERE dataset = ? AND settings = ?', (dataset, settings)).fetchall()
+		finally:
+			connection.close()
+		return dict(((parseGridValue(c), parseGridValue(g)), rate) for c, g, rate in rows)
+
+	def store(self, dataset, settings, fold, rates):
+		# Adds {(log2c, log2g): rate}, rates that are already known are kept
+		if not rates:
+			return
+		connection = self.connect()
+		try:
+			with connection:
+				connection.executemany('INSERT OR IGNORE INTO rates VALUES (?, ?, ?, ?, ?, ?)',
+				                       [ (dataset, settings, fold, gridValue(c), gridValue(g), float(rate)) for (c, g), rate in rates.items() ])
+		finally:
+			connection.close()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+# Local stand-ins for the libSVM tools used by easy_WSC.py, for benchmarks on machines without libSVM
+#   svm-train-q, svm-predict (patched: "predicted,real" output), svm-scale, tools/grid_patched.py
+# The classifier is a nearest class centroid, c and g are accepted but ignored. Command lines,
+# output files and the last line of the grid search match the real tools, the accuracy does not.
+#
+# install(path) writes wrappers into path, which can be used as "-svm path" for easy_WSC.py.
+
+import sys, os, stat
+import numpy as np
+from wsc_scale import Scaler, parseInstances
+from wsc_dataset import Dataset
+
+tools = [ 'svm-train-q', 'svm-predict', 'svm-scale' ]
+
+def install(path):
+	if not os.path.isdir(os.path.join(path, 'tools')):
+		os.makedirs(os.path.join(path, 'tools'))
+	script = os.path.abspath(__file__).replace('.pyc', '.py')
+	for tool in tools:
+		wrapper = os.path.join(path, tool)
+		fout = open(wrapper, 'w')
+		fout.write('#!/bin/sh\nexec "{0}" "{1}" {2} "$@"\n'.format(sys.executable, script, tool))
+		fout.close()
+		os.chmod(wrapper, os.stat(wrapper).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+	# grid.py is started with python, the wrapper has to be python
+	fout = open(os.path.join(path, 'tools', 'grid_patched.py'), 'w')
+	fout.write('import sys\nsys.path.insert(0, {0!r})\nimport wsc_standin\nwsc_standin.main([ "grid" ] + sys.argv[1:])\n'.format(os.path.dirname(script)))
+	fout.close()
+	return path
+
+def readProblem(filename):
+	fin = open(filename, 'r')
+	labels, features = parseInstances(fin.read())
+	fin.close()
+	return labels, features
+
+def fit(labels, features):
+	classes = np.unique(labels)
+	centroids = np.array([ features[labels == label].mean(axis=0) for label in classes ]) if len(classes) else np.zeros((0, features.shape[1]))
+	return classes, centroids
+
+def predict(model, features):
+	classes, centroids = model
+	width = min(features.shape[1], centroids.shape[1])
+	features = features[:, :width]; centroids = centroids[:, :width]
+	# |x - c|^2 without the constant |x|^2
+	distances = (centroids**2).sum(axis=1)[None, :] - 2 * np.dot(features, centroids.T)
+	return classes[distances.argmin(axis=1)]
+
+def crossValidation(labels, features, nr_fold):
+	# accuracy in percent, folds are assigned round robin
+	fold = np.arange(len(labels)) % nr_fold
+	correct = 0
+	for current in range(nr_fold):
+		test = fold == current
+		if test.all() or not test.any():
+			continue
+		correct += np.count_nonzero(predict(fit(labels[~test], features[~test]), features[test]) == labels[test])
+	return 100.0 * correct / max(1, len(labels))
+
+def arguments(argv, flags):
+	# (options, positional) of libSVM-like command lines
+	options = {}; positional = []
+	i = 0
+	while i < len(argv):
+		if argv[i] in flags:
+			options[argv[i]] = argv[i+1]
+			i += 2
+		elif argv[i].startswith('-') and len(argv[i]) > 1 and argv[i] not in flags:
+			options[argv[i]] = True
+			i += 1
+		else:
+			positional.append(argv[i])
+			i += 1
+	return options, positional
+
+def train(argv):
+	options, positional = arguments(argv, [ '-c', '-g', '-v', '-t', '-s', '-m' ])
+	labels, features = readProblem(positional[0])
+	if '-v' in options:
+		print('Cross Validation Accuracy = {0}%'.format(crossValidation(labels, features, int(options['-v']))))
+		return
+	classes, centroids = fit(labels, features)
+	model_file = positional[1] if len(positional) > 1 else os.path.basename(positional[0]) + '.model'
+	np.savetxt(model_file, np.column_stack((classes, centroids)) if len(classes) else np.zeros((0, 1)), fmt='%.17g')
+
+def test(argv):
+	options, positional = arguments(argv, [ '-b' ])
+	labels, features = readProblem(positional[0])
+	model = np.loadtxt(positional[1], ndmin=2)
+	predicted = predict((model[:, 0], model[:, 1:]), features)
+	fpredict = open(positional[2], 'w')
+	for pred, real in zip(predicted, labels):
+		fpredict.write('%d,%d\n' % (pred, real))
+	fpredict.close()
+	correct = np.count_nonzero(predicted == labels)
+	print('Accuracy = {0}% ({1}/{2}) (classification)'.format(100.0 * correct / max(1, len(labels)), correct, len(labels)))
+
+def scale(argv):
+	options, positional = arguments(argv, [ '-l', '-u', '-s', '-r', '-y' ])
+	labels, features = readProblem(positional[0])
+	if '-r' in options:
+		scaler = Scaler().load(options['-r'])
+	else:
+		scaler = Scaler(float(options.get('-l', -1)), float(options.get('-u', 1))).fit([ features ])
+	if '-s' in options:
+		scaler.save(options['-s'])
+	dataset = Dataset.fromBlocks([ (labels, features) ], scaler)
+	for label, start, end in dataset.segments():
+		sys.stdout.write(dataset.formatLines(label, np.arange(start, end)))
+
+def gridRange(option):
+	# parameters that are not searched are reported as log2 0
+	if option == 'null':
+		return [ 0.0 ]
+	begin, end, step = map(float, option.split(','))
+	seq = []
+	while not ((step > 0 and begin > end) or (step < 0 and begin < end)):
+		seq.append(begin)
+		begin += step
+	return seq
+
+def grid(argv):
+	options, positional = arguments(argv, [ '-log2c', '-log2g', '-v', '-worker', '-out', '-resume', '-png', '-svmtrain', '-gnuplot' ])
+	labels, features = readProblem(positional[-1])
+	# every grid point gives the same rate, only the format of the output matters
+	rate = crossValidation(labels, features, int(options.get('-v', 5)))
+	c_seq = gridRange(options.get('-log2c', '-5,15,2'))
+	g_seq = gridRange(options.get('-log2g', '3,-15,-2'))
+	fout = open(options['-out'], 'a') if '-out' in options else None
+	for c in c_seq:
+		for g in g_seq:
+			if fout is not None:
+				fout.write('log2c={0} log2g={1} rate={2}\n'.format(c, g, rate))
+			print('[local] {0} {1} {2} (best c={3}, g={4}, rate={2})'.format(c, g, rate, 2.0**c_seq[0], 2.0**g_seq[0]))
+	if fout is not None:
+		fout.close()
+	print('{0} {1} {2}'.format(2.0**c_seq[0], 2.0**g_seq[0], rate))
+
+def main(argv):
+	tool = argv[0]
+	if tool == 'svm-train-q':
+		train(argv[1:])
+	elif tool == 'svm-predict':
+		test(argv[1:])
+	elif tool == 'svm-scale':
+		scale(argv[1:])
+	elif tool == 'grid':
+		grid(argv[1:])
+	else:
+		print('Error: Unknown Tool! (' + tool + ')')
+		sys.exit(1)
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Out-of-core open-world background for easy_WSC.py -stream YES
+#   the background file and its domain list are read together in chunks of chunkSize instances,
+#   only one chunk is parsed, scaled and formatted at a time
+#   scan(): range of the background (for the scaler) and the number of instances the domain filter keeps
+#   chunks(): scaled chunks with the kept instances of every fold part
+# Fold parts are drawn chunk by chunk (FoldAssigner): without shuffling part i holds the i-th
+# pagesPerBGFold kept instances like in memory, with shuffling every kept instance ends up in a
+# uniformly random part (or is dropped by the background limit), the parts keep their exact sizes
+# and the file order of their instances.
+
+import itertools
+import numpy as np
+from wsc_scale import parseInstances, blockRange
+from wsc_dataset import Dataset
+from wsc_domains import filterDomains
+
+# Instances per chunk, bounds the memory of a streamed background
+chunkSize = 100000
+
+def mergeRange(first, second):
+	# blockRange of two blocks stacked, missing features count as 0 (see Scaler.fitRanges)
+	width = max(len(first[1]), len(second[1]))
+	fmin = np.full(width, np.inf)
+	fmax = np.full(width, -np.inf)
+	for count, bmin, bmax in (first, second):
+		if count == 0:
+			continue
+		n = len(bmin)
+		np.minimum(fmin[:n], bmin, out=fmin[:n])
+		np.maximum(fmax[:n], bmax, out=fmax[:n])
+		if n < width:
+			np.minimum(fmin[n:], 0, out=fmin[n:])
+			np.maximum(fmax[n:], 0, out=fmax[n:])
+	return first[0] + second[0], fmin, fmax
+
+class FoldAssigner(object):
+
+	def __init__(self, folds, pagesPerBGFold, kept, shuffle=False, seed=None):
+		# kept instances are spread over the parts 1..folds, the remainder (part 0) is dropped
+		self.quotas = np.array([ kept - folds*pagesPerBGFold ] + [ pagesPerBGFold ] * folds, np.int64)
+		self.pagesPerBGFold = pagesPerBGFold
+		self.size = folds*pagesPerBGFold
+		self.shuffle = shuffle
+		self.rng = np.random.RandomState(seed)
+		self.position = 0
+
+	def assign(self, count):
+		# Parts of the next count kept instances
+		if not self.shuffle:
+			positions = np.arange(self.position, self.position + count)
+			self.position += count
+			parts = positions // max(self.pagesPerBGFold, 1) + 1
+			parts[positions >= self.size] = 0
+			return parts
+		# Multivariate hypergeometric draw of the chunk's share of every remaining quota
+		counts = np.zeros(len(self.quotas), np.int64)
+		left = count
+		for part in range(len(self.quotas) - 1):
+			if left == 0:
+				break
+			counts[part] = self.rng.hypergeometric(self.quotas[part], self.quotas[part+1:].sum(), left) if self.quotas[part] > 0 else 0
+			left -= counts[part]
+		counts[-1] += left
+		self.quotas -= counts
+		parts = np.repeat(np.arange(len(self.quotas)), counts)
+		self.rng.shuffle(parts)
+		return parts
+
+class BackgroundStream(object):
+
+	def __init__(self, feature_file, links_file, resolver, chunkSize=chunkSize):
+		self.feature_file = feature_file
+		self.links_file = links_file
+		self.resolver = resolver
+		self.chunkSize = chunkSize
+
+	def read(self):
+		# (labels, features, links) of every chunk in file order, links may run short at the end
+		ffeatures = open(self.feature_file, 'r')
+		flinks = open(self.links_file, 'r')
+		try:
+			while True:
+				lines = list(itertools.islice(ffeatures, self.chunkSize))
+				if not lines:
+					break
+				links = [ line.rstrip('\n') for line in itertools.islice(flinks, len(lines)) ]
+				labels, features = parseInstances(''.join(lines))
+				yield labels, features, links
+		finally:
+			ffeatures.close()
+			flinks.close()
+
+	def filter(self, links, foreground):
+		# (kept, skipped) indices of a chunk
+		return filterDomains(self.resolver.resolve(links), foreground)
+
+	def scan(self, foreground, skippedLink=None):
+		# (range, instances, kept instances, links) of the background, skippedLink(domain, link) for every skipped link
+		background = (0, np.zeros(0), np.zeros(0))
+		instances = 0; kept = 0; links = 0
+		for labels, features, chunkLinks in self.read():
+			background = mergeRange(background, blockRange(features))
+			chunkKept, chunkSkipped = self.filter(chunkLinks, foreground)
+			instances += len(labels)
+			kept += int(np.count_nonzero(chunkKept < len(labels)))
+			links += len(chunkLinks)
+			if skippedLink is not None:
+				for i in chunkSkipped[chunkSkipped < len(labels)]:
+					skippedLink(self.resolver.domain(chunkLinks[i]), chunkLinks[i])
+		return background, instances, kept, links
+
+	def chunks(self, scaler, foreground, assigner):
+		# (scaled chunk Dataset, [ kept indices of part 1..folds ]) of every chunk
+		for labels, features, links in self.read():
+			chunk = Dataset.fromBlocks([ (labels, features) ], scaler)
+			kept, _ = self.filter(links, foreground)
+			kept = kept[kept < len(labels)]
+			parts = assigner.assign(len(kept))
+			yield chunk, [ kept[parts == part] for part in range(1, len(assigner.quotas)) ]
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+# Stage instrumentation of easy_WSC.py
+#   every stage (merge, scale, load, ...) is recorded as an event with its fold, wall time, CPU time
+#   of the thread, bytes read & written by the thread, and the peak RSS of the process so far
+#   every subprocess is recorded with its command, exit status, duration, the fold of the stage
+#   that started it and its own CPU time and peak RSS (os.wait4)
+#   CPU time, bytes and RSS of a stage only count the python process, the subprocesses its thread
+#   ran during the stage are added as children_cpu and children_peak_rss
+#   stages of parallel folds overlap, their summed time can exceed the wall time
+#
+# save() writes
+#   .timings: { "wall": seconds, "stages": { name: { "count", "total", "max", "cpu", "read", "written",
+#                                                   "children_cpu", "children_peak_rss" } },
+#               "tools": { name: { "count", "total", "max", "failed", "cpu", "peak_rss" } },
+#               "folds": { fold: { stage: seconds } }, "peak_rss": bytes, "children_peak_rss": bytes,
+#               "events": [...] }
+#   .trace.json: the same events in Chrome's trace event format (chrome://tracing, Perfetto)
+#
+# Bytes are taken from /proc/thread-self/io (Linux), without it they are reported as 0.
+
+from subprocess import *
+import sys, os, time, json, threading
+try:
+	import resource
+except ImportError:
+	resource = None
+
+def cpuTime():
+	# CPU time of the calling thread, of the process on old pythons
+	if hasattr(time, 'thread_time'):
+		return time.thread_time()
+	return time.clock()
+
+def ioBytes():
+	# (bytes read, bytes written) by the calling thread
+	for io_file in [ '/proc/thread-self/io', '/proc/self/io' ]:
+		try:
+			fio = open(io_file, 'r')
+		except IOError:
+			continue
+		counters = dict(line.split(': ') for line in fio.read().splitlines())
+		fio.close()
+		return int(counters['rchar']), int(counters['wchar'])
+	return 0, 0
+
+def toolName(cmd):
+	# svm-train-q, svm-scale, ... or the script started by python
+	tokens = [ os.path.basename(token.strip('"')) for token in cmd.split() ]
+	if tokens[0].startswith('python') and len(tokens) > 1:
+		return tokens[1]
+	return tokens[0]
+
+def maxRSS(usage):
+	# ru_maxrss in bytes (KB on Linux, bytes on macOS)
+	return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+def peakRSS(children=False):
+	# Peak resident set size of the process (or of its largest finished subprocess) in bytes
+	if resource is None:
+		return 0
+	return maxRSS(resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF))
+
+def exitStatus(status):
+	# returncode of Popen: exit status, or the negative signal number
+	if os.WIFSIGNALED(status):
+		return -os.WTERMSIG(status)
+	return os.WEXITSTATUS(status)
+
+def readPipes(process):
+	# (stdout, stderr) like communicate(), the process is not waited for
+	errors = []
+	reader = None
+	if process.stderr is not None:
+		reader = threading.Thread(target=lambda: errors.append(process.stderr.read()))
+		reader.start()
+	output = None
+	if process.stdout is not None:
+		output = process.stdout.read()
+		process.stdout.close()
+	if reader is not None:
+		reader.join()
+		process.stderr.close()
+	return output, errors[0] if errors else None
+
+class Timer(object):
+
+	def __init__(self):
+		self.origin = time.time()
+		self.events = []
+		self.lock = threading.Lock()
+		# fold of the running stage of each thread, for subprocesses
+		self.local = threading.local()
+
+	def branch(self):
+		# Timer with the same origin and the events so far, its later events are not added here
+		timer = Timer()
+		timer.origin = self.origin
+		with self.lock:
+			timer.events = list(self.events)
+		return timer
+
+	def start(self, name, fold=None):
+		# token for stop()
+		self.local.fold = fold
+		read, written = ioBytes()
+		return (name, fold, time.time(), cpuTime(), read, written)
+
+	def stop(self, token):
+		name, fold, start, cpu, read, written = token
+		end = time.time()
+		endRead, endWritten = ioBytes()
+		self.local.fold = None
+		thread = threading.current_thread().name
+		event = { 'name': name, 'category': 'stage', 'start': start - self.origin, 'end': end - self.origin,
+		          'thread': thread, 'cpu': cpuTime() - cpu,
+		          'read': endRead - read, 'written': endWritten - written, 'peak_rss': peakRSS() }
+		if fold is not None:
+			event['fold'] = fold
+		with self.lock:
+			# subprocesses of the stage: started by its thread while it ran
+			children = [ child for child in self.events if child['category'] == 'subprocess' and child['thread'] == thread
+			             and child['start'] >= event['start'] and child['end'] <= event['end'] ]
+			event['children_cpu'] = sum([ child.get('cpu', 0.0) for child in children ])
+			event['children_peak_rss'] = max([ child.get('peak_rss', 0) for child in children ] + [ 0 ])
+			self.events.append(event)
+		return end - start
+
+	def run(self, cmd, **options):
+		# Popen(cmd, shell = True, **options).communicate(), recorded with exit status, duration and
+		# the resource usage of the process (the shell, and the tool it runs)
+		start = time.time()
+		process = Popen(cmd, shell = True, **options)
+		usage = None
+		if hasattr(os, 'wait4'):
+			output = readPipes(process)
+			_, status, usage = os.wait4(process.pid, 0)
+			process.returncode = exitStatus(status)
+		else:
+			output = process.communicate()
+		end = time.time()
+		event = { 'name': toolName(cmd), 'category': 'subprocess', 'command': cmd,
+		          'start': start - self.origin, 'end': end - self.origin, 'thread': threading.current_thread().name,
+		          'status': process.returncode }
+		if usage is not None:
+			event['cpu'] = usage.ru_utime + usage.ru_stime
+			event['peak_rss'] = maxRSS(usage)
+		if getattr(self.local, 'fold', None) is not None:
+			event['fold'] = self.local.fold
+		with self.lock:
+			self.events.append(event)
+		return output
+
+	def summary(self):
+		stages = {}; tools = {}; folds = {}
+		for event in self.events:
+			duration = event['end'] - event['start']
+			if event['category'] == 'subprocess':
+				tool = tools.setdefault(event['name'], { 'count': 0, 'total': 0.0, 'max': 0.0, 'failed': 0, 'cpu': 0.0, 'peak_rss': 0 })
+				tool['count'] += 1
+				tool['total'] += duration
+				tool['max'] = max(tool['max'], duration)
+				tool['failed'] += event['status'] != 0
+				tool['cpu'] += event.get('cpu', 0.0)
+				tool['peak_rss'] = max(tool['peak_rss'], event.get('peak_rss', 0))
+				continue
+			stage = stages.setdefault(event['name'], { 'count': 0, 'total': 0.0, 'max': 0.0, 'cpu': 0.0, 'read': 0, 'written': 0,
+			                                           'children_cpu': 0.0, 'children_peak_rss': 0 })
+			stage['count'] += 1
+			stage['total'] += duration
+			stage['max'] = max(stage['max'], duration)
+			for key in [ 'cpu', 'read', 'written', 'children_cpu' ]:
+				stage[key] += event.get(key, 0)
+			stage['children_peak_rss'] = max(stage['children_peak_rss'], event.get('children_peak_rss', 0))
+			if 'fold' in event:
+				fold = folds.setdefault(str(event['fold']), {})
+				fold[event['name']] = fold.get(event['name'], 0.0) + duration
+		return stages, tools, folds
+
+	def trace(self):
+		# Chrome trace events, one row per thread
+		pid = os.getpid()
+		threads = {}
+		events = []
+		for event in sorted(self.events, key=lambda event: event['start']):
+			tid = threads.setdefault(event['thread'], len(threads) + 1)
+			args = dict((key, value) for key, value in event.items() if key not in [ 'name', 'category', 'start', 'end', 'thread' ])
+			events.append({ 'name': event['name'], 'cat': event['category'], 'ph': 'X', 'pid': pid, 'tid': tid,
+			                'ts': event['start'] * 1e6, 'dur': (event['end'] - event['start']) * 1e6, 'args': args })
+		for thread, tid in threads.items():
+			events.append({ 'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': { 'name': thread } })
+		return { 'traceEvents': events, 'displayTimeUnit': 'ms' }
+
+	def save(self, timings_file, trace_file=None):
+		stages, tools, folds = self.summary()
+		ftimings = open(timings_file, 'w')
+		json.dump({ 'wall': time.time() - self.origin, 'stages': stages, 'tools': tools, 'folds': folds, 'peak_rss': peakRSS(),
+		            'children_peak_rss': peakRSS(True), 'events': self.events }, ftimings, sort_keys=True)
+		ftimings.write('\n')
+		ftimings.close()
+		if trace_file is not None:
+			ftrace = open(trace_file, 'w')
+			json.dump(self.trace(), ftrace)
+			ftrace.write('\n')
+			ftrace.close()
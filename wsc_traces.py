@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# Traces of the fetches (output-tcp/{page}: one instance per line) for ProcessWSC.py
+#   an instance is a line of "time:size" packets, incoming packets are positive and outgoing
+#   packets negative (as in generate-feature.py's CUMULATIVE features),
+#   tokens without ":" (e.g. a leading URL) are kept but not counted
+#
+# Outlier removal ("Simple", as outlier-removal.py -outlierRemoval Simple is used by ProcessWSC.sh):
+#   instances whose incoming size lies outside [Q1 - 1.5 IQR, Q3 + 1.5 IQR] of their page are outliers,
+#   a page keeps a fixed number of random instances and is dropped if it has fewer
+#   -ignoreOutlier YES (the fallback if too few pages remain) also draws from the outliers
+# Both selections are computed in one pass over the traces of a site.
+# compareSelection checks the rule against the pages & instances outlier-removal.py selected.
+
+import os, shutil
+import numpy as np
+
+# Tukey's fences of the Simple outlier removal
+outlierFactor = 1.5
+# Sign of the sizes of incoming packets
+incomingSign = 1
+
+def packetSizes(line):
+	return np.array([ int(float(token.rsplit(':', 1)[1])) for token in line.split() if ':' in token ], np.int64)
+
+def readPage(filename):
+	# (instance lines, incoming size of each instance)
+	fin = open(filename, 'r')
+	lines = [ line if line.endswith('\n') else line + '\n' for line in fin if line.strip() ]
+	fin.close()
+	incoming = np.array([ incomingSign * sizes[incomingSign * sizes > 0].sum() for sizes in map(packetSizes, lines) ], np.int64)
+	return lines, incoming
+
+def outlierFree(incoming):
+	# Mask of the instances within the fences of their page
+	if len(incoming) == 0:
+		return np.zeros(0, bool)
+	q1, q3 = np.percentile(incoming, [ 25, 75 ])
+	iqr = q3 - q1
+	return (incoming >= q1 - outlierFactor * iqr) & (incoming <= q3 + outlierFactor * iqr)
+
+def sampleInstances(candidates, instances, rng, randomInstances=True):
+	# instances of the candidate indices (in file order), None if there are too few
+	if len(candidates) < instances:
+		return None
+	if randomInstances:
+		return sorted(rng.sample(list(candidates), instances))
+	return list(candidates[:instances])
+
+def selectPages(pagespath, instances, rng, randomInstances=True):
+	# (strict, fallback, lines): selected instances of every page that has enough of them
+	# without outliers (strict) and if outliers are ignored (fallback)
+	strict = {}; fallback = {}; lines = {}
+	for page in sorted(os.listdir(pagespath)):
+		pageLines, incoming = readPage(os.path.join(pagespath, page))
+		selected = sampleInstances(np.flatnonzero(outlierFree(incoming)), instances, rng, randomInstances)
+		if selected is not None:
+			strict[page] = selected
+		selected = sampleInstances(np.arange(len(pageLines)), instances, rng, randomInstances)
+		if selected is not None:
+			fallback[page] = selected
+			lines[page] = pageLines
+	return strict, fallback, lines
+
+def writePages(outputpath, selection, lines):
+	# Only the selected pages and instances are written
+	if os.path.isdir(outputpath):
+		shutil.rmtree(outputpath)
+	os.makedirs(outputpath)
+	for page, selected in selection.items():
+		fout = open(os.path.join(outputpath, page), 'w')
+		fout.write(''.join([ lines[page][k] for k in selected ]))
+		fout.close()
+
+def compareSelection(pagespath, selectedpath, instances, ignoreOutlier):
+	# Differences between the native rule and the pages outlier-removal.py wrote to selectedpath
+	# Its instances are drawn at random, so only the pages and the instances they are drawn from are compared
+	expected = {}
+	if os.path.isdir(pagespath):
+		for page in sorted(os.listdir(pagespath)):
+			pageLines, incoming = readPage(os.path.join(pagespath, page))
+			kept = np.ones(len(pageLines), bool) if ignoreOutlier else outlierFree(incoming)
+			if kept.sum() >= instances:
+				expected[page] = set(line for line, keep in zip(pageLines, kept) if keep)
+	selected = set(os.listdir(selectedpath)) if os.path.isdir(selectedpath) else set()
+	mismatches = []
+	for page in sorted(set(expected) - selected):
+		mismatches.append(page + ': kept natively, dropped by outlier-removal.py')
+	for page in sorted(selected - set(expected)):
+		mismatches.append(page + ': dropped natively, kept by outlier-removal.py')
+	for page in sorted(selected & set(expected)):
+		pageLines = readPage(os.path.join(selectedpath, page))[0]
+		outside = len([ line for line in pageLines if line not in expected[page] ])
+		if len(pageLines) != instances:
+			mismatches.append('{0}: {1} instances instead of {2}'.format(page, len(pageLines), instances))
+		if outside:
+			mismatches.append('{0}: {1} instances are outliers natively'.format(page, outside))
+	return mismatches